@@ -0,0 +1,476 @@
+
+import os
+
+# Benchmarks run headless: no window, no sound. Set before pygame is imported
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import gc
+import json
+import platform
+import random
+import sys
+import time
+
+import pygame
+
+import pacman
+import pong
+import pong_chaos
+import snake
+import tetris
+from runtime import open_window
+
+# Baselines are specific to the machine (and Python and pygame) they were
+# recorded on, so none is kept in the repository: record one with
+# --save-baseline on the machine that runs the comparisons
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+
+# Slowdown of a score allowed before a benchmark counts as regressed; above the
+# run-to-run noise of scores on a busy single core VM
+TOLERANCE = 0.3
+
+# Every benchmark does a fixed, seeded amount of work and returns
+# (operations done, seconds spent on them); it is registered with its unit
+BENCHMARKS = {}
+
+
+def benchmark(name, unit):
+    def register(function):
+        BENCHMARKS[name] = (function, unit)
+        return function
+    return register
+
+
+def key_event(key):
+    return pygame.event.Event(pygame.KEYDOWN, key=key)
+
+
+# Pac-Man
+
+def pacman_actions(rng, ticks):
+    # Held directions that change every 10 to 40 ticks, like a player would
+    actions = []
+    while len(actions) < ticks:
+        action = rng.choice((pacman.LEFT, pacman.RIGHT, pacman.UP, pacman.DOWN))
+        actions.extend([action] * rng.randint(10, 40))
+    return actions[:ticks]
+
+
+@benchmark("pacman_logic", "ticks/s")
+def bench_pacman_logic(scale):
+    ticks = int(20000 * scale)
+    actions = pacman_actions(random.Random(1), ticks)
+    game = pacman.PacmanGame(seed=1)
+    start = time.perf_counter()
+    for action in actions:
+        game.step(action)
+        if game.game_over:
+            game = pacman.PacmanGame(seed=1)
+    return ticks, time.perf_counter() - start
+
+
+@benchmark("pacman_render", "frames/s")
+def bench_pacman_render(scale):
+    frames = int(2000 * scale)
+    actions = pacman_actions(random.Random(2), frames)
+    screen = open_window((pacman.SCREEN_WIDTH, pacman.SCREEN_HEIGHT), "Pac-Man")
+    game = pacman.PacmanGame(seed=2)
+    view = pacman.PacmanView(screen, game)
+    elapsed = 0.0
+    for action in actions:
+        game.step(action)
+        view.collect_eaten()
+        if game.game_over:
+            game = pacman.PacmanGame(seed=2)
+            view = pacman.PacmanView(screen, game)
+        start = time.perf_counter()
+        view.draw()
+        elapsed += time.perf_counter() - start
+    return frames, elapsed
+
+
+@benchmark("pacman_wall_collision", "calls/s")
+def bench_pacman_wall_collision(scale):
+    rng = random.Random(3)
+    rects = [pygame.Rect(rng.randint(-40, pacman.SCREEN_WIDTH), rng.randint(0, pacman.SCREEN_HEIGHT - 40), 40, 40)
+             for _ in range(int(200000 * scale))]
+    collides = pacman.wall_grid.collides
+    start = time.perf_counter()
+    for rect in rects:
+        collides(rect)
+    return len(rects), time.perf_counter() - start
+
+
+@benchmark("pacman_pellet_eating", "calls/s")
+def bench_pacman_pellet_eating(scale):
+    # Sweep a player-sized rect along every row, a pixel at a time, eating as it goes
+    sweeps = max(1, int(20 * scale))
+    calls = 0
+    elapsed = 0.0
+    for _ in range(sweeps):
+        pellets = pacman.create_pellets()
+        rects = [pygame.Rect(x, y, 40, 40) for y in range(0, pacman.SCREEN_HEIGHT, 40)
+                 for x in range(0, pacman.SCREEN_WIDTH - 40)]
+        start = time.perf_counter()
+        for rect in rects:
+            for tile, _ in list(pacman.pellets_under(pellets, rect)):
+                del pellets[tile]
+        elapsed += time.perf_counter() - start
+        calls += len(rects)
+    return calls, elapsed
+
+
+# Tetris
+
+TETRIS_KEYS = (pygame.K_LEFT, pygame.K_RIGHT, pygame.K_UP, pygame.K_DOWN, pygame.K_SPACE)
+
+
+def tetris_script(rng, ticks):
+    # A key press on roughly one tick in six
+    return [rng.choice(TETRIS_KEYS) if rng.random() < 0.16 else None for _ in range(ticks)]
+
+
+def play_tetris_tick(game, key):
+    if key is not None:
+        game.handle_event(key_event(key))
+    game.update()
+
+
+@benchmark("tetris_logic", "ticks/s")
+def bench_tetris_logic(scale):
+    ticks = int(100000 * scale)
+    script = tetris_script(random.Random(4), ticks)
+    game = tetris.Tetris(headless=True, seed=4)
+    start = time.perf_counter()
+    for key in script:
+        play_tetris_tick(game, key)
+        if game.game_over:
+            game = tetris.Tetris(headless=True, seed=4)
+    return ticks, time.perf_counter() - start
+
+
+@benchmark("tetris_render", "frames/s")
+def bench_tetris_render(scale):
+    frames = int(3000 * scale)
+    script = tetris_script(random.Random(5), frames)
+    game = tetris.Tetris(seed=5)
+    elapsed = 0.0
+    for key in script:
+        play_tetris_tick(game, key)
+        if game.game_over:
+            game = tetris.Tetris(seed=5)
+        start = time.perf_counter()
+        game.render()
+        elapsed += time.perf_counter() - start
+    return frames, elapsed
+
+
+def tetris_board(rng, rows):
+    # Random rubble in the bottom rows, never a full row
+    board = [0] * tetris.GRID_HEIGHT
+    for y in range(tetris.GRID_HEIGHT - rows, tetris.GRID_HEIGHT):
+        board[y] = rng.getrandbits(tetris.GRID_WIDTH) & ~(1 << rng.randrange(tetris.GRID_WIDTH))
+    return board
+
+
+@benchmark("tetris_check_collision", "calls/s")
+def bench_tetris_check_collision(scale):
+    rng = random.Random(6)
+    game = tetris.Tetris(headless=True, seed=6)
+    game.rows = tetris_board(rng, 10)
+    pieces = []
+    for _ in range(int(200000 * scale)):
+        piece = tetris.Tetromino(rng.randint(-1, tetris.GRID_WIDTH - 2), rng.randint(0, tetris.GRID_HEIGHT - 2),
+                                 rng.randrange(len(tetris.SHAPES)))
+        for _ in range(rng.randrange(4)):
+            piece.rotate()
+        pieces.append(piece)
+    start = time.perf_counter()
+    for piece in pieces:
+        game.check_collision(piece)
+    return len(pieces), time.perf_counter() - start
+
+
+@benchmark("tetris_clear_lines", "calls/s")
+def bench_tetris_clear_lines(scale):
+    # Boards with one to four full rows mixed into rubble
+    rng = random.Random(7)
+    game = tetris.Tetris(headless=True, seed=7)
+    calls = int(20000 * scale)
+    elapsed = 0.0
+    for _ in range(calls):
+        rows = tetris_board(rng, 12)
+        for y in rng.sample(range(tetris.GRID_HEIGHT - 12, tetris.GRID_HEIGHT), rng.randint(1, 4)):
+            rows[y] = tetris.FULL_ROW
+        game.rows = rows
+        game.grid = [[1 if row >> x & 1 else 0 for x in range(tetris.GRID_WIDTH)] for row in rows]
+        game.heights = [next((tetris.GRID_HEIGHT - y for y, row in enumerate(rows) if row >> x & 1), 0)
+                        for x in range(tetris.GRID_WIDTH)]
+        game.filled_cells = sum(row.bit_count() for row in rows)
+        start = time.perf_counter()
+        game.clear_lines()
+        elapsed += time.perf_counter() - start
+    return calls, elapsed
+
+
+# Snake
+
+def long_snake(width, height, block, length):
+    # A snake of the given length laid along the board's Hamiltonian cycle, with
+    # the cycle to keep following: it never crashes however long it gets
+    game = snake.SnakeGame(width, height, block)
+    cycle = snake.hamiltonian_cycle(width // block, height // block)
+    body = [(x * block, y * block) for x, y in cycle[:length]]
+    game.free_cells.add((game.x1, game.y1))
+    game.snake_List.clear()
+    game.snake_cells.clear()
+    for cell in body:
+        game.free_cells.remove(cell)
+    game.snake_List.extend(body)
+    game.snake_cells.update(body)
+    game.Length_of_snake = length
+    game.x1, game.y1 = body[-1]
+    return game, cycle
+
+
+def follow_cycle(game, cycle, position):
+    x, y = cycle[(position + 1) % len(cycle)]
+    game.turn(x * game.block - game.x1, y * game.block - game.y1)
+    game.step()
+    return position + 1
+
+
+@benchmark("snake_self_collision", "ticks/s")
+def bench_snake_self_collision(scale):
+    # Ticks of a 20000 cell snake on a 200x200 board; each checks the new head
+    # against the whole body
+    random.seed(8)
+    ticks = int(100000 * scale)
+    game, cycle = long_snake(2000, 2000, 10, 20000)
+    position = len(game.snake_List) - 1
+    start = time.perf_counter()
+    for _ in range(ticks):
+        position = follow_cycle(game, cycle, position)
+    return ticks, time.perf_counter() - start
+
+
+@benchmark("snake_render", "frames/s")
+def bench_snake_render(scale):
+    random.seed(9)
+    frames = int(3000 * scale)
+    snake.init_display()
+    game, cycle = long_snake(snake.screen_width, snake.screen_height, snake.snake_block, 300)
+    position = len(game.snake_List) - 1
+    elapsed = 0.0
+    for frame in range(frames):
+        # Six frames per tick, as at 60 FPS with 10 ticks a second
+        if frame % 6 == 0:
+            position = follow_cycle(game, cycle, position)
+        start = time.perf_counter()
+        snake.draw_game(game, frame % 6 / 6)
+        elapsed += time.perf_counter() - start
+    return frames, elapsed
+
+
+# Pong
+
+def reset_pong():
+    pong.ball.center = (pong.WIDTH / 2, pong.HEIGHT / 2)
+    pong.ball_x, pong.ball_y = float(pong.ball.x), float(pong.ball.y)
+    pong.ball_speed_x = pong.ball_speed_y = 7
+    pong.player1.centery = pong.player2.centery = pong.HEIGHT // 2
+    pong.player1_score = pong.player2_score = 0
+
+
+def pong_script(rng, ticks):
+    # Right paddle speed per tick: held up, down or still for a while at a time
+    speeds = []
+    while len(speeds) < ticks:
+        speeds.extend([rng.choice((-7, 0, 7))] * rng.randint(5, 30))
+    return speeds[:ticks]
+
+
+@benchmark("pong_logic", "ticks/s")
+def bench_pong_logic(scale):
+    ticks = int(100000 * scale)
+    script = pong_script(random.Random(10), ticks)
+    reset_pong()
+    cpu = pong.PaddleAI(pong.player2, "hard", rng=random.Random(10))
+    start = time.perf_counter()
+    for speed in script:
+        pong.player1_speed = speed
+        pong.update(cpu)
+    return ticks, time.perf_counter() - start
+
+
+@benchmark("pong_render", "frames/s")
+def bench_pong_render(scale):
+    frames = int(3000 * scale)
+    script = pong_script(random.Random(11), frames)
+    pong.init_display()
+    reset_pong()
+    cpu = pong.PaddleAI(pong.player2, "hard", rng=random.Random(11))
+    elapsed = 0.0
+    for speed in script:
+        pong.player1_speed = speed
+        pong.update(cpu)
+        start = time.perf_counter()
+        pong.render(1.0)
+        elapsed += time.perf_counter() - start
+    return frames, elapsed
+
+
+@benchmark("pong_collision", "calls/s")
+def bench_pong_collision(scale):
+    # Balls anywhere on the field at up to 100 px per tick, several bounces each
+    rng = random.Random(12)
+    states = [(rng.uniform(0, pong.WIDTH - 30), rng.uniform(0, pong.HEIGHT - 30),
+               rng.uniform(-100, 100), rng.uniform(-100, 100)) for _ in range(int(100000 * scale))]
+    paddles = (pong.player1, pong.player2)
+    start = time.perf_counter()
+    for x, y, speed_x, speed_y in states:
+        pong.move_ball(x, y, speed_x, speed_y, paddles=paddles)
+    return len(states), time.perf_counter() - start
+
+
+@benchmark("pong_chaos_logic", "ticks/s")
+def bench_pong_chaos_logic(scale):
+    ticks = int(2000 * scale)
+    swarm = pong_chaos.BallSwarm(500, seed=13)
+    paddles = (pong.player1, pong.player2)
+    start = time.perf_counter()
+    for _ in range(ticks):
+        swarm.step(paddles)
+    return ticks, time.perf_counter() - start
+
+
+# Fixed pure-Python work (tuples, dict lookups, integer arithmetic, the mix
+# the game logic is made of) timed next to every benchmark run. On a shared or
+# throttled machine the speed of everything drifts by tens of percent from one
+# minute to the next; scores relative to this loop drift far less
+REFERENCE_ITERATIONS = 100000
+
+
+def reference_loop():
+    table = {}
+    total = 0
+    start = time.perf_counter()
+    for i in range(REFERENCE_ITERATIONS):
+        key = (i & 255, i >> 8 & 15)
+        table[key] = table.get(key, 0) + 1
+        total += key[0] * 3 - (total & 7)
+    return REFERENCE_ITERATIONS / (time.perf_counter() - start)
+
+
+def measure(name, scale, repeat):
+    # Best of repeat runs: the least disturbed one. Each run is scored against
+    # the reference loop timed just before and just after it. The garbage
+    # collector is off while they run (as timeit does), so its pauses don't
+    # land wherever earlier benchmarks happened to leave the heap
+    function, unit = BENCHMARKS[name]
+    best = best_score = 0.0
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            reference = reference_loop()
+            count, elapsed = function(scale)
+            reference = (reference + reference_loop()) / 2
+        finally:
+            gc.enable()
+        rate = count / elapsed
+        best = max(best, rate)
+        best_score = max(best_score, rate / reference)
+    return {"value": best, "score": best_score, "unit": unit}
+
+
+def run(names, scale=1.0, repeat=5):
+    # value is operations per second; score is the same relative to the
+    # reference loop, and is what baselines are compared on
+    results = {}
+    for name in names:
+        results[name] = measure(name, scale, repeat)
+        print(f"{name:24} {results[name]['value']:14,.0f} {results[name]['unit']:9} score {results[name]['score']:.4g}")
+    return results
+
+
+def compare(results, baseline, tolerance):
+    # Print every benchmark's score against the baseline; returns the regressed names
+    regressions = []
+    print(f"\n{'benchmark':24} {'baseline':>10} {'now':>10} {'change':>8}")
+    for name, result in results.items():
+        if "score" not in baseline.get(name, {}):
+            print(f"{name:24} {'-':>10} {result['score']:10.4g}      new")
+            continue
+        before = baseline[name]["score"]
+        change = result["score"] / before - 1
+        regressed = change < -tolerance
+        if regressed:
+            regressions.append(name)
+        print(f"{name:24} {before:10.4g} {result['score']:10.4g} {change:+8.1%}{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless benchmarks for all four games")
+    parser.add_argument("names", nargs="*", metavar="NAME",
+                        help="benchmarks to run (default: all): " + ", ".join(BENCHMARKS))
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply the work done by every benchmark")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per benchmark; the best one counts")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help=f"JSON results to compare against (default {BASELINE_FILE})")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE,
+                        help=f"slowdown allowed before failing (default {TOLERANCE} = {TOLERANCE:.0%}%)")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    args = parser.parse_args()
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error("unknown benchmark: " + ", ".join(unknown))
+    # A baseline asked for by name has to be there; the default one is only
+    # there once it has been saved on this machine
+    if args.baseline and not args.save_baseline and not os.path.exists(args.baseline):
+        parser.error(f"no baseline at {args.baseline}")
+    baseline_file = args.baseline or BASELINE_FILE
+
+    results = run(args.names or list(BENCHMARKS), args.scale, args.repeat)
+    pygame.quit()
+    report = {
+        "environment": {
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+    if args.save_baseline:
+        with open(baseline_file, "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"\nBaseline saved to {baseline_file}")
+        return
+
+    if not os.path.exists(baseline_file):
+        print(f"\nNo baseline at {baseline_file}, nothing to compare against; "
+              "record one with --save-baseline")
+    else:
+        with open(baseline_file) as file:
+            baseline = json.load(file)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            # Measure them again before failing: a slowdown that is real shows
+            # up twice, a burst of load on the machine rarely does
+            print("\nMeasuring again: " + ", ".join(regressions))
+            rerun = {name: measure(name, args.scale, args.repeat) for name in regressions}
+            regressions = compare(rerun, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) more than {args.tolerance:.0%} slower than the baseline: "
+                  + ", ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
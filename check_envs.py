@@ -0,0 +1,70 @@
+
+import os
+import sys
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import numpy as np
+
+from envs import ENVS, SnakeEnv, VectorEnv
+
+ENV_COUNT = 5
+WORKERS = 2
+STEPS = 3000
+
+
+def check_snake_observation(steps=20000):
+    # The snake observation only redraws the cells that changed; it must
+    # always equal the grid drawn from scratch
+    env = SnakeEnv(200, 200, 20)
+    env.reset(3)
+    full = np.zeros_like(env.observation)
+    for action in np.random.default_rng(2).integers(env.action_count, size=steps):
+        observation, _, done, _ = env.step(action)
+        env.redraw = True
+        env.observe(full)
+        env.redraw = False
+        if not (full == observation).all():
+            print(f"Snake observation: FAILED after step {env.steps}")
+            return 1
+        if done:
+            env.reset()
+    print("Snake observation: ok")
+    return 0
+
+
+def check_vector(name):
+    # A VectorEnv steps each environment exactly as it steps on its own in
+    # this process, episode ends and resets included
+    make_env = ENVS[name]
+    vector = VectorEnv(make_env, ENV_COUNT, WORKERS)
+    serial = [make_env() for _ in range(ENV_COUNT)]
+    observations = vector.reset(10)
+    expected = [env.reset(10 + i) for i, env in enumerate(serial)]
+    failures = sum(not (observations[i] == expected[i]).all() for i in range(ENV_COUNT))
+
+    rng = np.random.default_rng(0)
+    episodes = 0
+    for _ in range(STEPS):
+        actions = rng.integers(vector.action_count, size=ENV_COUNT)
+        observations, rewards, dones, infos = vector.step(actions)
+        for i, env in enumerate(serial):
+            observation, reward, done, _ = env.step(actions[i])
+            same = reward == rewards[i] and done == dones[i]
+            if done:
+                same = same and (infos[i]["final_observation"] == observation).all()
+                episodes += 1
+                observation = env.reset()
+            if not (same and (observations[i] == observation).all()):
+                failures += 1
+    vector.close()
+    print(f"{name}: {ENV_COUNT} environments over {STEPS} steps, {episodes} episodes ended"
+          f"{'' if not failures else f', {failures} mismatches  FAILED'}")
+    return failures
+
+
+if __name__ == "__main__":
+    failures = check_snake_observation()
+    for name in ENVS:
+        failures += check_vector(name)
+    sys.exit(1 if failures else 0)
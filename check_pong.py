@@ -0,0 +1,91 @@
+
+import os
+import random
+import sys
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import numpy as np
+import pygame
+
+from pong import HEIGHT, WIDTH, move_ball
+from pong_chaos import BallSwarm
+
+STATES = 20000
+SWARM = 5000
+SIZE = 30
+
+
+def random_state(rng):
+    # A ball anywhere on the field with any speed up to 400 px per step, and
+    # both paddles somewhere along their edges
+    speed = rng.uniform(5, 400)
+    speed_x = speed * rng.choice((-1, 1))
+    speed_y = rng.uniform(-speed, speed)
+    x = rng.uniform(30, WIDTH - 60)
+    y = rng.uniform(0, HEIGHT - SIZE)
+    paddles = (
+        pygame.Rect(WIDTH - 20, rng.randint(0, HEIGHT - 140), 10, 140),
+        pygame.Rect(10, rng.randint(0, HEIGHT - 140), 10, 140),
+    )
+    return x, y, speed_x, speed_y, rng.choice((1, 1, 3, 10)), paddles
+
+
+def sub_stepped(x, y, speed_x, speed_y, dt, paddles):
+    # The same move split into steps of at most a pixel
+    steps = int(max(abs(speed_x), abs(speed_y)) * dt) + 1
+    for _ in range(steps):
+        x, y, speed_x, speed_y, goal = move_ball(x, y, speed_x, speed_y, dt / steps, paddles, SIZE)
+        if goal:
+            break
+    return x, y, speed_x, speed_y, goal
+
+
+def check_move_ball():
+    # One swept move lands where fine sub-steps do: same bounces, same goals,
+    # and never outside the field or through a paddle
+    rng = random.Random(0)
+    failures = 0
+    for _ in range(STATES):
+        x, y, speed_x, speed_y, dt, paddles = random_state(rng)
+        swept = move_ball(x, y, speed_x, speed_y, dt, paddles, SIZE)
+        reference = sub_stepped(x, y, speed_x, speed_y, dt, paddles)
+        on_field = -1e-6 <= swept[0] <= WIDTH - SIZE + 1e-6 and -1e-6 <= swept[1] <= HEIGHT - SIZE + 1e-6
+        same = swept[2:] == reference[2:] and abs(swept[0] - reference[0]) < 1e-6 and abs(swept[1] - reference[1]) < 1e-6
+        if not (on_field and same):
+            failures += 1
+            print(f"FAILED from {(x, y, speed_x, speed_y)} over {dt}: swept {swept}, sub-stepped {reference}")
+    print(f"move_ball: {STATES - failures} of {STATES} states match")
+    return failures
+
+
+def check_swarm():
+    # One BallSwarm step moves every ball the way move_ball moves it alone;
+    # balls that score respawn, so those are only counted
+    rng = random.Random(1)
+    failures = 0
+    for dt in (1.0, 2.0):
+        swarm = BallSwarm(SWARM, seed=1, size=SIZE)
+        states = [random_state(rng)[:4] for _ in range(SWARM)]
+        states[:50] = [(x, y, 0.0, speed_y) for x, y, _, speed_y in states[:50]]
+        states[50:100] = [(x, y, speed_x, 0.0) for x, y, speed_x, _ in states[50:100]]
+        swarm.x[:], swarm.y[:], swarm.speed_x[:], swarm.speed_y[:] = (np.array(column) for column in zip(*states))
+        paddles = (pygame.Rect(WIDTH - 20, 200, 10, 140), pygame.Rect(10, 100, 10, 140))
+
+        alone = [move_ball(*state, dt, paddles, SIZE) for state in states]
+        goals = swarm.step(paddles, dt)
+        expected = (sum(moved[4] == "left" for moved in alone), sum(moved[4] == "right" for moved in alone))
+        if goals != expected:
+            failures += 1
+            print(f"FAILED over {dt}: {goals} goals, move_ball scores {expected}")
+        for i, moved in enumerate(alone):
+            swarmed = (swarm.x[i], swarm.y[i], swarm.speed_x[i], swarm.speed_y[i])
+            if moved[4] is None and not np.allclose(swarmed, moved[:4]):
+                failures += 1
+                print(f"FAILED ball {i} from {states[i]} over {dt}: swarm {swarmed}, move_ball {moved[:4]}")
+        print(f"BallSwarm over {dt}: {SWARM} balls, {goals[0] + goals[1]} goals")
+    return failures
+
+
+if __name__ == "__main__":
+    sys.exit(1 if check_move_ball() + check_swarm() else 0)
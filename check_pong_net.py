@@ -0,0 +1,98 @@
+
+import random
+import sys
+import time
+
+from pong_net import LaggyLink, NetSession, initial_state, open_socket, simulate
+
+TICKS = 600
+TIMEOUT = 30 # Seconds before a match that hasn't finished counts as stuck
+
+# (name, latency, jitter, loss, seconds during which right to left packets are
+# all lost); the outages last longer than MAX_ROLLBACK ticks so both sides stall
+LINKS = [
+    ("laggy", 0.1, 0.04, 0.05, None),
+    ("1.5 s outage", 0.03, 0.0, 0.0, (2.0, 3.5)),
+    ("3 s outage", 0.03, 0.0, 0.0, (2.0, 5.0)),
+]
+
+
+class OutageLink(LaggyLink):
+    # Drops everything sent between two times (seconds after start)
+    def __init__(self, sock, latency, jitter, loss, rng, start, outage):
+        super().__init__(sock, latency, jitter, loss, rng)
+        self.start = start
+        self.outage = outage
+
+    def sendto(self, data, address):
+        elapsed = time.perf_counter() - self.start
+        if self.outage and self.outage[0] <= elapsed < self.outage[1]:
+            return
+        super().sendto(data, address)
+
+
+def play(seed, latency, jitter, loss, outage):
+    # Both sides of a match over loopback through a bad link, each pressing
+    # random keys at 60 ticks a second. Returns the sessions, the inputs each
+    # side played by tick, and whether the match finished in time
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    left_sock, right_sock = open_socket(0), open_socket(0)
+    sessions = [
+        NetSession("left", left_sock, right_sock.getsockname(),
+                   OutageLink(left_sock, latency, jitter, loss, random.Random(seed + 1), start, None)),
+        NetSession("right", right_sock, left_sock.getsockname(),
+                   OutageLink(right_sock, latency, jitter, loss, random.Random(seed + 2), start, outage)),
+    ]
+    played = [[], []]
+    held = [0, 0]
+
+    finished = False
+    while time.perf_counter() - start < TIMEOUT:
+        if all(s.state.tick >= TICKS and s.remote_confirmed >= TICKS - 1 for s in sessions):
+            finished = True
+            break
+        for session in sessions:
+            session.link.flush()
+            session.poll()
+        due = min(int((time.perf_counter() - start) * 60), TICKS)
+        for side, session in enumerate(sessions):
+            while session.state.tick < due:
+                if rng.random() < 0.1:
+                    held[side] = rng.choice((-1, 0, 1))
+                if not session.advance(held[side]):
+                    break
+                played[side].append(held[side])
+            if session.state.tick >= TICKS:
+                session.send() # Keep resending the last inputs until they are confirmed
+        time.sleep(0.002)
+
+    left_sock.close()
+    right_sock.close()
+    return sessions, played, finished
+
+
+def check_sessions(seeds=2):
+    # Once every input has arrived both sides must hold exactly the state of
+    # the same match played on one machine
+    failures = 0
+    for name, latency, jitter, loss, outage in LINKS:
+        for seed in range(seeds):
+            (left, right), (left_inputs, right_inputs), finished = play(seed, latency, jitter, loss, outage)
+            state = initial_state()
+            for left_input, right_input in zip(left_inputs, right_inputs):
+                state = simulate(state, left_input, right_input)
+            ok = finished and left.state == right.state == state
+            failures += not ok
+            print(f"{name}, seed {seed}: {left.rollbacks} + {right.rollbacks} rollbacks, "
+                  f"{left.resimulated_ticks + right.resimulated_ticks} ticks simulated again, "
+                  f"score {state.left_score}:{state.right_score}{'' if ok else '  FAILED'}")
+            if not finished:
+                print(f"  stuck at left tick {left.state.tick}, right tick {right.state.tick}")
+            elif not ok:
+                print(f"  left  {left.state}\n  right {right.state}\n  local {state}")
+    return failures
+
+
+if __name__ == "__main__":
+    sys.exit(1 if check_sessions() else 0)
@@ -0,0 +1,68 @@
+
+import random
+import sys
+
+from snake import Autopilot, SnakeGame, hamiltonian_cycle, spare_cell_cycle
+
+# Boards in pixels (20 px cells) and the free cells the autopilot must leave at
+# the end of a round on each: boards with a Hamiltonian cycle are cleared, odd
+# by odd boards are filled to one cell short (see Autopilot)
+BOARDS = [
+    (600, 400, 0), # The game's own board
+    (620, 400, 0), # Odd number of columns
+    (600, 420, 0), # Odd number of rows
+    (80, 60, 0),
+    (140, 140, 1),
+    (580, 380, 1),
+]
+SEEDS = 5
+MAX_TICKS = 500000
+
+
+def check_cycles():
+    # Every cycle visits each cell (but the spare) once, one step at a time
+    for cols in range(2, 12):
+        for rows in range(2, 12):
+            cycle = hamiltonian_cycle(cols, rows)
+            spare = None
+            if cycle is None:
+                cycle, spare = spare_cell_cycle(cols, rows)
+            if cycle is None:
+                continue
+            cells = {(x, y) for x in range(cols) for y in range(rows)} - {spare}
+            assert len(cycle) == len(cells) and set(cycle) == cells, (cols, rows)
+            for (x1, y1), (x2, y2) in zip(cycle, cycle[1:] + cycle[:1]):
+                assert abs(x1 - x2) + abs(y1 - y2) == 1, (cols, rows)
+    print("Cycles: ok")
+
+
+def autopilot_round(width, height, seed):
+    # (snake length, ticks, free cells left) for one round
+    game = SnakeGame(width, height, 20, random.Random(seed))
+    autopilot = Autopilot(game)
+    ticks = 0
+    while not game.game_close and ticks < MAX_TICKS:
+        move = autopilot.next_move()
+        if move:
+            game.turn(*move)
+        game.step()
+        ticks += 1
+    return game.Length_of_snake, ticks, len(game.free_cells.cells)
+
+
+def check_autopilot():
+    failures = 0
+    for width, height, expected in BOARDS:
+        cells = (width // 20) * (height // 20)
+        for seed in range(SEEDS):
+            length, ticks, free = autopilot_round(width, height, seed)
+            ok = free == expected and ticks < MAX_TICKS
+            failures += not ok
+            print(f"{width}x{height} seed {seed}: length {length}, {free} of {cells} cells free "
+                  f"after {ticks} ticks{'' if ok else '  FAILED'}")
+    return failures
+
+
+if __name__ == "__main__":
+    check_cycles()
+    sys.exit(1 if check_autopilot() else 0)
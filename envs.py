@@ -0,0 +1,450 @@
+
+import argparse
+import multiprocessing
+import os
+import random
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+import pygame
+
+from pacman import DOWN, LEFT, RIGHT, STAY, TILE_SIZE, UP, PacmanGame, PowerPellet, wall_grid
+from pong import HEIGHT, PADDLE_SPEED, WIDTH, PaddleAI, ball, play_tick, player1, player2
+from snake import SnakeGame, screen_height, screen_width, snake_block
+from tetris import GRID_HEIGHT, GRID_WIDTH, Tetris
+
+
+# Gym-style wrapper around one headless game: reset(seed) starts an episode
+# and returns its first observation, step(action) runs the game for one tick
+# and returns (observation, reward, done, info). Actions are ints below
+# action_count. Observations are NumPy arrays of observation_shape and
+# observation_dtype, written in place into self.observation (which VectorEnv
+# points at shared memory), so copy one to keep it past the next step.
+# Subclasses provide new_game(seed), act(action) -> (reward, done),
+# observe(out) and info()
+class GameEnv:
+    observation_shape = ()
+    observation_dtype = np.uint8
+    action_count = 1
+
+    def __init__(self, max_steps=None):
+        # Episodes still running after max_steps end with info["truncated"]
+        self.max_steps = max_steps
+        self.observation = np.zeros(self.observation_shape, self.observation_dtype)
+        # Each episode's game seed is drawn from this, so a seeded reset makes
+        # the episodes after it repeatable too
+        self.seed_rng = random.Random()
+        self.steps = 0
+
+    def reset(self, seed=None):
+        if seed is not None:
+            self.seed_rng.seed(seed)
+        self.steps = 0
+        self.new_game(self.seed_rng.getrandbits(32))
+        self.observe(self.observation)
+        return self.observation
+
+    def step(self, action):
+        reward, done = self.act(int(action))
+        self.steps += 1
+        truncated = not done and self.max_steps is not None and self.steps >= self.max_steps
+        self.observe(self.observation)
+        info = self.info()
+        info["truncated"] = truncated
+        return self.observation, reward, done or truncated, info
+
+    def info(self):
+        return {}
+
+
+class TetrisEnv(GameEnv):
+    # One step is one 60 Hz tick after at most one key press: 0 nothing,
+    # 1 left, 2 right, 3 rotate, 4 soft drop, 5 hard drop. The reward is the
+    # score gained. Observation: the board, 1 for locked cells and 2 for the
+    # falling piece
+    observation_shape = (GRID_HEIGHT, GRID_WIDTH)
+    action_count = 6
+
+    # Shifts that bring bit x of a row mask down to bit 0, for unpacking the bitboard
+    COLUMNS = np.arange(GRID_WIDTH)
+
+    def new_game(self, seed):
+        self.game = Tetris(headless=True, seed=seed)
+
+    def act(self, action):
+        game = self.game
+        score = game.score
+        if game.current_piece is not None:
+            if action == 1:
+                game.move_piece(-1, 0)
+            elif action == 2:
+                game.move_piece(1, 0)
+            elif action == 3:
+                game.rotate_piece()
+            elif action == 4:
+                game.move_piece(0, 1)
+            elif action == 5:
+                game.hard_drop()
+        if not game.game_over:
+            game.update()
+        return float(game.score - score), game.game_over
+
+    def observe(self, out):
+        game = self.game
+        out[...] = (np.array(game.rows)[:, None] >> self.COLUMNS) & 1
+        piece = game.current_piece
+        if piece is not None and not game.game_over:
+            for y, row in enumerate(piece.shape):
+                for x, cell in enumerate(row):
+                    if cell:
+                        out[piece.y + y, piece.x + x] = 2
+
+    def info(self):
+        return {"score": self.game.score, "lines": self.game.lines}
+
+
+# Snake turns for actions 1-4, in blocks
+SNAKE_TURNS = [None, (-1, 0), (1, 0), (0, -1), (0, 1)]
+
+
+class SnakeEnv(GameEnv):
+    # One step is one tick: 0 keeps going, 1-4 turn left, right, up, down.
+    # Reward 1 for each food eaten and -1 for crashing. Observation: the grid
+    # of cells, 1 for the body, 2 for the head and 3 for the food
+    action_count = 5
+
+    def __init__(self, width=screen_width, height=screen_height, block=snake_block, max_steps=None):
+        self.width = width
+        self.height = height
+        self.block = block
+        self.observation_shape = (height // block, width // block)
+        super().__init__(max_steps)
+
+    def new_game(self, seed):
+        self.game = SnakeGame(self.width, self.height, self.block, random.Random(seed))
+        self.redraw = True
+
+    def act(self, action):
+        game = self.game
+        if action:
+            dx, dy = SNAKE_TURNS[action]
+            game.turn(dx * self.block, dy * self.block)
+        length = game.Length_of_snake
+        game.step()
+        # The game only notices the head has left the board a tick later; the
+        # episode ends straight away
+        done = game.game_close or not (0 <= game.x1 < self.width and 0 <= game.y1 < self.height)
+        reward = game.Length_of_snake - length
+        if done:
+            self.redraw = True
+            if not reward: # Filling the board also ends the round, with a reward
+                reward = -1
+        return float(reward), done
+
+    def cell(self, x, y):
+        return int(y // self.block), int(x // self.block)
+
+    def observe(self, out):
+        # Only the cells a tick changes are redrawn: the old head becomes body,
+        # the tail moves off and the head and food move on
+        game = self.game
+        if self.redraw:
+            self.redraw = False
+            out.fill(0)
+            for x, y in game.snake_List:
+                if 0 <= x < self.width and 0 <= y < self.height:
+                    out[self.cell(x, y)] = 1
+        else:
+            out[self.cell(*game.previous_head)] = 1
+            if game.previous_tail is not None:
+                out[self.cell(*game.previous_tail)] = 0
+        if 0 <= game.x1 < self.width and 0 <= game.y1 < self.height:
+            out[self.cell(game.x1, game.y1)] = 2
+        out[self.cell(game.foodx, game.foody)] = 3
+
+    def info(self):
+        return {"score": self.game.Length_of_snake - 1}
+
+
+# Paddle movement for Pong actions 0-2: stay, up, down
+PONG_MOVES = [0, -PADDLE_SPEED, PADDLE_SPEED]
+
+
+class PongEnv(GameEnv):
+    # The agent plays the right paddle against the CPU paddle on the left, one
+    # step per tick: 0 stay, 1 up, 2 down. Reward 1 for each point won and -1
+    # for each point lost; the episode ends when either side has points.
+    # Observation: the ball's position and speed, then the tops of the agent's
+    # and the CPU's paddles, scaled to about -1..1
+    observation_shape = (6,)
+    observation_dtype = np.float32
+    action_count = 3
+
+    def __init__(self, difficulty="normal", points=11, max_steps=None):
+        self.difficulty = difficulty
+        self.points = points
+        self.size = ball.width
+        self.start = (WIDTH / 2 - self.size / 2, HEIGHT / 2 - self.size / 2)
+        super().__init__(max_steps)
+
+    def new_game(self, seed):
+        rng = random.Random(seed)
+        self.right = pygame.Rect(player1)
+        self.left = pygame.Rect(player2)
+        self.cpu = PaddleAI(self.left, self.difficulty, PADDLE_SPEED, rng)
+        self.x, self.y = self.start
+        self.speed_x, self.speed_y = rng.choice((-7, 7)), rng.choice((-7, 7))
+        self.agent_score = self.cpu_score = 0
+
+    def act(self, action):
+        # Same order as pong.update: the ball, then the agent, then the CPU
+        self.x, self.y, self.speed_x, self.speed_y, self.left.y, self.right.y, goal = play_tick(
+            self.x, self.y, self.speed_x, self.speed_y, self.left, self.right, 0, PONG_MOVES[action], self.size
+        )
+        reward = 0.0
+        if goal == "left":
+            self.agent_score += 1
+            reward = 1.0
+        elif goal == "right":
+            self.cpu_score += 1
+            reward = -1.0
+
+        self.cpu.update(self.x, self.y, self.speed_x, self.speed_y, self.size)
+        return reward, max(self.agent_score, self.cpu_score) >= self.points
+
+    def observe(self, out):
+        out[0] = self.x / WIDTH * 2 - 1
+        out[1] = self.y / HEIGHT * 2 - 1
+        out[2] = self.speed_x / 7
+        out[3] = self.speed_y / 7
+        out[4] = self.right.y / HEIGHT * 2 - 1
+        out[5] = self.left.y / HEIGHT * 2 - 1
+
+    def info(self):
+        return {"score": self.agent_score, "cpu_score": self.cpu_score}
+
+
+# Pac-Man actions 0-4
+PACMAN_ACTIONS = [STAY, LEFT, RIGHT, UP, DOWN]
+
+# Maze tile codes in Pac-Man observations
+PACMAN_WALL = 1
+PACMAN_PELLET = 2
+PACMAN_POWER_PELLET = 3
+PACMAN_GHOST = 4
+PACMAN_FRIGHTENED_GHOST = 5
+PACMAN_PLAYER = 6
+
+
+class PacmanEnv(GameEnv):
+    # One step is one tick: 0 stay, 1-4 left, right, up, down. The reward is
+    # the score gained; the episode ends when Pac-Man is caught or the board is
+    # cleared. Observation: the maze tiles (the codes above), with each actor
+    # on the tile under its centre. Ghosts in or heading back to the house are
+    # left out
+    observation_shape = (wall_grid.height, wall_grid.width)
+    action_count = 5
+
+    def __init__(self, max_steps=60 * 60 * 5):
+        super().__init__(max_steps)
+        self.walls = np.array(wall_grid.cells, np.uint8) * PACMAN_WALL
+
+    def new_game(self, seed):
+        self.game = PacmanGame(seed)
+        # Walls and the pellets left; eaten pellets are taken off every step
+        self.board = self.walls.copy()
+        for (x, y), pellet in self.game.pellets.items():
+            self.board[y, x] = PACMAN_POWER_PELLET if isinstance(pellet, PowerPellet) else PACMAN_PELLET
+
+    def act(self, action):
+        game = self.game
+        score = game.score
+        game.step(PACMAN_ACTIONS[action])
+        for rect in game.eaten_rects:
+            self.board[rect.centery // TILE_SIZE, rect.centerx // TILE_SIZE] = 0
+        return float(game.score - score), game.game_over or not game.pellets
+
+    def tile(self, rect):
+        x = min(max(rect.centerx // TILE_SIZE, 0), wall_grid.width - 1)
+        y = min(max(rect.centery // TILE_SIZE, 0), wall_grid.height - 1)
+        return y, x
+
+    def observe(self, out):
+        out[...] = self.board
+        for ghost in self.game.ghosts:
+            if ghost.state == "frightened":
+                out[self.tile(ghost.rect)] = PACMAN_FRIGHTENED_GHOST
+            elif ghost.state in ("active", "exiting_house"):
+                out[self.tile(ghost.rect)] = PACMAN_GHOST
+        out[self.tile(self.game.player.rect)] = PACMAN_PLAYER
+
+    def info(self):
+        return {"score": self.game.score}
+
+
+ENVS = {
+    "tetris": TetrisEnv,
+    "snake": SnakeEnv,
+    "pong": PongEnv,
+    "pacman": PacmanEnv,
+}
+
+
+def shared_array(shape, dtype):
+    # A NumPy array over a new block of shared memory
+    size = max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1)
+    memory = shared_memory.SharedMemory(create=True, size=size)
+    return memory, np.ndarray(shape, dtype, buffer=memory.buf)
+
+
+def attach_arrays(specs):
+    # The worker's side of shared_array: (memory blocks, arrays) for
+    # (name, shape, dtype) specs
+    memories = [shared_memory.SharedMemory(name=name) for name, _, _ in specs]
+    arrays = [np.ndarray(shape, dtype, buffer=memory.buf) for memory, (_, shape, dtype) in zip(memories, specs)]
+    return memories, arrays
+
+
+def worker(connection, make_env, first, last, specs):
+    # Runs environments first..last-1 of a VectorEnv until told to close. Every
+    # command gets a reply on the pipe once the shared arrays are written
+    memories, (observations, rewards, dones, actions) = attach_arrays(specs)
+    envs = []
+    for i in range(first, last):
+        env = make_env()
+        env.observation = observations[i] # Observations go straight to shared memory
+        envs.append(env)
+
+    while True:
+        command, seed = connection.recv()
+        if command == "reset":
+            for i, env in enumerate(envs, first):
+                env.reset(None if seed is None else seed + i)
+            connection.send(None)
+        elif command == "step":
+            infos = []
+            for i, env in enumerate(envs, first):
+                _, rewards[i], dones[i], info = env.step(actions[i])
+                if dones[i]:
+                    info["final_observation"] = observations[i].copy()
+                    env.reset()
+                infos.append(info)
+            connection.send(infos)
+        else:
+            break
+
+    del observations, rewards, dones, actions
+    for memory in memories:
+        memory.close()
+    connection.close()
+
+
+# count environments stepped in parallel by worker processes, each running a
+# contiguous slice of them (so one step is one message per worker, not per
+# environment). Observations, rewards, done flags and actions are arrays in
+# shared memory that both sides read and write in place; the pipes only carry
+# the commands and the info dicts. make_env() builds one environment; where
+# processes are spawned rather than forked it has to be picklable (a class or
+# module level function, or a functools.partial of one). Environments that
+# finish are reset straight away, so their step returns the next episode's
+# first observation and the last one is in info["final_observation"]
+class VectorEnv:
+    def __init__(self, make_env, count, workers=None):
+        env = make_env()
+        self.count = count
+        self.action_count = env.action_count
+        self.buffers = []
+        self.observations = self.add_buffer((count,) + tuple(env.observation_shape), env.observation_dtype)
+        self.rewards = self.add_buffer((count,), np.float64)
+        self.dones = self.add_buffer((count,), np.bool_)
+        self.actions = self.add_buffer((count,), np.int64)
+        specs = [(memory.name, array.shape, array.dtype) for memory, array in self.buffers]
+
+        workers = max(1, min(count, workers or os.cpu_count()))
+        self.connections = []
+        self.processes = []
+        for w in range(workers):
+            first, last = count * w // workers, count * (w + 1) // workers
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=worker, args=(child, make_env, first, last, specs), daemon=True)
+            process.start()
+            child.close()
+            self.connections.append(parent)
+            self.processes.append(process)
+
+    def add_buffer(self, shape, dtype):
+        memory, array = shared_array(shape, dtype)
+        self.buffers.append((memory, array))
+        return array
+
+    def reset(self, seed=None):
+        # Environment i is seeded with seed + i. Returns the observations
+        # array, which every step overwrites
+        for connection in self.connections:
+            connection.send(("reset", seed))
+        for connection in self.connections:
+            connection.recv()
+        return self.observations
+
+    def step(self, actions):
+        # (observations, rewards, dones, infos); the arrays are the shared
+        # buffers themselves, so copy what has to outlive the next step
+        self.actions[:] = actions
+        for connection in self.connections:
+            connection.send(("step", None))
+        infos = []
+        for connection in self.connections:
+            infos.extend(connection.recv())
+        return self.observations, self.rewards, self.dones, infos
+
+    def close(self):
+        for connection in self.connections:
+            connection.send(("close", None))
+        for process in self.processes:
+            process.join()
+        for connection in self.connections:
+            connection.close()
+        self.connections = []
+        self.processes = []
+        self.observations = self.rewards = self.dones = self.actions = None
+        for memory, _ in self.buffers:
+            memory.close()
+            memory.unlink()
+        self.buffers = []
+
+
+def measure(name, envs, workers, steps, seed=0):
+    # Environment steps per second with random actions: one environment in
+    # this process, then envs of them across workers
+    env = ENVS[name]()
+    rng = np.random.default_rng(seed)
+    env.reset(seed)
+    start = time.perf_counter()
+    for action in rng.integers(env.action_count, size=steps):
+        if env.step(action)[2]:
+            env.reset()
+    single = steps / (time.perf_counter() - start)
+
+    vector = VectorEnv(ENVS[name], envs, workers)
+    vector.reset(seed)
+    batches = max(1, steps // envs)
+    start = time.perf_counter()
+    for _ in range(batches):
+        vector.step(rng.integers(vector.action_count, size=envs))
+    parallel = batches * envs / (time.perf_counter() - start)
+    vector.close()
+    return single, parallel
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure environment step throughput")
+    parser.add_argument("game", choices=sorted(ENVS))
+    parser.add_argument("--envs", type=int, default=os.cpu_count() * 4, help="environments in the vector (default: 4 per core)")
+    parser.add_argument("--workers", type=int, help="worker processes (default: all cores)")
+    parser.add_argument("--steps", type=int, default=20000, help="environment steps to time")
+    args = parser.parse_args()
+
+    single, parallel = measure(args.game, args.envs, args.workers, args.steps)
+    print(f"One environment: {single:.0f} steps/s")
+    print(f"{args.envs} environments: {parallel:.0f} steps/s")
@@ -0,0 +1,93 @@
+
+import time
+
+START_TIME = time.perf_counter() # Before anything heavy is imported
+
+import argparse
+import importlib
+import os
+import sys
+
+import pygame
+
+from runtime import open_window
+
+# Games on the menu: (name on the command line, title, module, how to start it).
+# A game's module is only imported once it has been picked
+GAMES = [
+    ("pacman", "Pac-Man", "pacman", lambda module: module.main()),
+    ("tetris", "Tetris", "tetris", lambda module: module.Tetris().run()),
+    ("snake", "Snake", "snake", lambda module: module.gameLoop()),
+    ("pong", "Pong", "pong", lambda module: module.main()),
+]
+
+MENU_SIZE = (400, 300)
+BLACK = (0, 0, 0)
+WHITE = (255, 255, 255)
+YELLOW = (255, 255, 0)
+
+
+def draw_menu(screen, font, selected):
+    screen.fill(BLACK)
+    for i, (_, title, _, _) in enumerate(GAMES):
+        color = YELLOW if i == selected else WHITE
+        text = font.render(f"{i + 1}  {title}", True, color)
+        screen.blit(text, (60, 50 + 50 * i))
+    pygame.display.flip()
+
+
+def pick_game():
+    # Menu window: 1-4, or arrows and Enter. Sleeps between key presses
+    screen = open_window(MENU_SIZE, "Games")
+    font = pygame.font.Font(None, 48)
+    selected = 0
+    while True:
+        draw_menu(screen, font, selected)
+        event = pygame.event.wait()
+        if event.type == pygame.QUIT:
+            return None
+        if event.type != pygame.KEYDOWN:
+            continue
+        if event.key in (pygame.K_ESCAPE, pygame.K_q):
+            return None
+        if event.key == pygame.K_UP:
+            selected = (selected - 1) % len(GAMES)
+        if event.key == pygame.K_DOWN:
+            selected = (selected + 1) % len(GAMES)
+        if event.key in (pygame.K_RETURN, pygame.K_SPACE):
+            return GAMES[selected]
+        if pygame.K_1 <= event.key < pygame.K_1 + len(GAMES):
+            return GAMES[event.key - pygame.K_1]
+
+
+def report_first_frame():
+    # Print the time from launch to the first frame shown, then exit
+    def first_frame(*args):
+        print(f"Cold start to first frame: {(time.perf_counter() - START_TIME) * 1000:.0f} ms")
+        sys.stdout.flush()
+        os._exit(0)
+
+    pygame.display.flip = first_frame
+    pygame.display.update = first_frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pick a game and play it")
+    parser.add_argument("game", nargs="?", choices=[name for name, _, _, _ in GAMES], help="skip the menu")
+    parser.add_argument("--measure", action="store_true", help="print the cold start time to the first frame and exit")
+    args = parser.parse_args()
+
+    if args.measure:
+        report_first_frame()
+    game = next(game for game in GAMES if game[0] == args.game) if args.game else pick_game()
+    if game is None:
+        pygame.quit()
+        return
+
+    _, _, module_name, start = game
+    sys.argv = sys.argv[:1] # The game sees no launcher arguments
+    start(importlib.import_module(module_name))
+
+
+if __name__ == "__main__":
+    main()
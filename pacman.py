@@ -2,17 +2,12 @@
 import pygame
 import random
 
-# Initialize Pygame
-pygame.init()
+from runtime import GameLoop, open_window
 
 # Screen dimensions
 SCREEN_WIDTH = 800
 SCREEN_HEIGHT = 600
 
-# Create the screen
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("Pac-Man")
-
 # Colors
 BLUE = (0, 0, 255)
 YELLOW = (255, 255, 0)
@@ -20,9 +15,84 @@ WHITE = (255, 255, 255)
 RED = (255, 0, 0)
 ORANGE = (255, 165, 0)
 
+# Game logic runs in fixed ticks; speeds and timers are per tick
+TICK_RATE = 60
+
+# Size of one maze tile in pixels
+TILE_SIZE = 40
+
+# Sprite cache: every ghost look and Pac-Man frame is drawn once into a
+# Surface the first time it is needed, after which drawing is a single blit
+ghost_sprites = {}
+player_sprites = {}
+
+def render_ghost_sprite(ghost_color, with_mouth):
+    # 44 px tall so the wavy bottom fits below the 40x40 body
+    sprite = pygame.Surface((40, 44), pygame.SRCALPHA)
+
+    # Draw the main body (inverted U shape)
+    pygame.draw.arc(sprite, ghost_color, (0, 0, 40, 40), 3.14, 6.28, 20) # Top arc
+    pygame.draw.rect(sprite, ghost_color, (0, 20, 40, 20)) # Bottom rectangle
+
+    # Draw the wavy bottom (triangles or circles)
+    pygame.draw.circle(sprite, ghost_color, (5, 35), 5)
+    pygame.draw.circle(sprite, ghost_color, (15, 38), 5)
+    pygame.draw.circle(sprite, ghost_color, (25, 35), 5)
+    pygame.draw.circle(sprite, ghost_color, (35, 38), 5)
+
+    # Draw eyes (always white with black pupils)
+    pygame.draw.circle(sprite, WHITE, (15, 15), 5) # Left eye
+    pygame.draw.circle(sprite, WHITE, (25, 15), 5) # Right eye
+    pygame.draw.circle(sprite, (0, 0, 0), (15, 15), 2) # Left pupil
+    pygame.draw.circle(sprite, (0, 0, 0), (25, 15), 2) # Right pupil
+
+    # Draw mouth (only when not frightened or eaten)
+    if with_mouth:
+        pygame.draw.line(sprite, (0, 0, 0), (10, 28), (15, 33), 2)
+        pygame.draw.line(sprite, (0, 0, 0), (15, 33), (20, 28), 2)
+        pygame.draw.line(sprite, (0, 0, 0), (20, 28), (25, 33), 2)
+        pygame.draw.line(sprite, (0, 0, 0), (25, 33), (30, 28), 2)
+
+    return sprite.convert_alpha()
+
+def get_ghost_sprite(color, state):
+    if state == "frightened":
+        key = ((0, 0, 255), False) # Blue when frightened
+    elif state == "eaten":
+        key = ((100, 100, 100), False) # Grey when eaten
+    else:
+        key = (color, True)
+
+    sprite = ghost_sprites.get(key)
+    if sprite is None:
+        sprite = ghost_sprites[key] = render_ghost_sprite(*key)
+    return sprite
+
+def render_player_sprite(direction):
+    sprite = pygame.Surface((40, 40), pygame.SRCALPHA)
+    # direction is 0: right, 1: left, 2: up, 3: down, or None for the closed mouth
+    if direction == 0:
+        pygame.draw.arc(sprite, YELLOW, (0, 0, 40, 40), 0.5, -0.5, 20)
+    elif direction == 1:
+        pygame.draw.arc(sprite, YELLOW, (0, 0, 40, 40), 3.6, 2.6, 20)
+    elif direction == 2:
+        pygame.draw.arc(sprite, YELLOW, (0, 0, 40, 40), 2.1, 1.1, 20)
+    elif direction == 3:
+        pygame.draw.arc(sprite, YELLOW, (0, 0, 40, 40), 5.2, 4.2, 20)
+    else:
+        pygame.draw.circle(sprite, YELLOW, (20, 20), 20)
+    return sprite.convert_alpha()
+
+def get_player_sprite(direction):
+    sprite = player_sprites.get(direction)
+    if sprite is None:
+        sprite = player_sprites[direction] = render_player_sprite(direction)
+    return sprite
+
+
 # Ghost class
 class Ghost:
-    def __init__(self, x, y, color, spawn_time):
+    def __init__(self, x, y, color, spawn_time, rng=random, personality="blinky"):
         self.rect = pygame.Rect(x, y, 40, 40)
         self.original_color = color
         self.color = color
@@ -35,38 +105,14 @@ class Ghost:
         self.respawn_timer = 0 # Timer for respawning after being eaten
         self.target_exit_x = 380 # Center of the ghost house exit
         self.target_exit_y = 360 # Center of the ghost house exit (adjusted for new maze)
+        self.rng = rng # Random source for direction choices (seedable for simulations)
+        self.personality = personality # "blinky", "pinky", "inky" or "clyde"; picks the chase target
+        self.target_tile = None # Tile to head for while active, set by the game each tick
+        self.navigation = get_navigation()
 
     def draw(self, screen):
-        if self.state == "frightened":
-            ghost_color = (0, 0, 255) # Blue when frightened
-        elif self.state == "eaten":
-            ghost_color = (100, 100, 100) # Grey when eaten
-        else:
-            ghost_color = self.color
-
-        # Draw the main body (inverted U shape)
-        pygame.draw.arc(screen, ghost_color, (self.rect.x, self.rect.y, 40, 40), 3.14, 6.28, 20) # Top arc
-        pygame.draw.rect(screen, ghost_color, (self.rect.x, self.rect.y + 20, 40, 20)) # Bottom rectangle
-
-        # Draw the wavy bottom (triangles or circles)
-        pygame.draw.circle(screen, ghost_color, (self.rect.x + 5, self.rect.y + 35), 5)
-        pygame.draw.circle(screen, ghost_color, (self.rect.x + 15, self.rect.y + 38), 5)
-        pygame.draw.circle(screen, ghost_color, (self.rect.x + 25, self.rect.y + 35), 5)
-        pygame.draw.circle(screen, ghost_color, (self.rect.x + 35, self.rect.y + 38), 5)
-
-        # Draw eyes (always white with black pupils)
-        pygame.draw.circle(screen, WHITE, (self.rect.x + 15, self.rect.y + 15), 5) # Left eye
-        pygame.draw.circle(screen, WHITE, (self.rect.x + 25, self.rect.y + 15), 5) # Right eye
-        pygame.draw.circle(screen, (0, 0, 0), (self.rect.x + 15, self.rect.y + 15), 2) # Left pupil
-        pygame.draw.circle(screen, (0, 0, 0), (self.rect.x + 25, self.rect.y + 15), 2) # Right pupil
-
-        # Draw mouth (only when not frightened or eaten)
-        if self.state != "frightened" and self.state != "eaten":
-            pygame.draw.line(screen, (0, 0, 0), (self.rect.x + 10, self.rect.y + 28), (self.rect.x + 15, self.rect.y + 33), 2)
-            pygame.draw.line(screen, (0, 0, 0), (self.rect.x + 15, self.rect.y + 33), (self.rect.x + 20, self.rect.y + 28), 2)
-            pygame.draw.line(screen, (0, 0, 0), (self.rect.x + 20, self.rect.y + 28), (self.rect.x + 25, self.rect.y + 33), 2)
-            pygame.draw.line(screen, (0, 0, 0), (self.rect.x + 25, self.rect.y + 33), (self.rect.x + 30, self.rect.y + 28), 2)
-
+        # One blit of the pre-rendered sprite for the current color/state
+        return screen.blit(get_ghost_sprite(self.color, self.state), self.rect.topleft)
 
     def move(self):
         if self.state == "waiting":
@@ -118,14 +164,22 @@ class Ghost:
                     self.respawn_timer = 0
 
         elif self.state == "active":
-            self.change_direction_timer += 1
+            # At every tile centre, take the exit that leads towards the target
+            if self.current_tile() in self.navigation.exits:
+                self.choose_new_direction()
+                # Exits in the navigation graph are always open
+                clear = True
+            else:
+                # Travelling between the centres of two open tiles can't hit a wall
+                clear = (self.dx != 0 and self.dy == 0 and self.rect.y % TILE_SIZE == 0) or \
+                        (self.dy != 0 and self.dx == 0 and self.rect.x % TILE_SIZE == 0)
 
             # Attempt to move
             new_x = self.rect.x + self.dx * self.speed
             new_y = self.rect.y + self.dy * self.speed
             temp_rect = pygame.Rect(new_x, new_y, self.rect.width, self.rect.height)
 
-            if not self.check_wall_collision(temp_rect):
+            if clear or ((self.dx or self.dy) and not self.check_wall_collision(temp_rect)):
                 self.rect.x = new_x
                 self.rect.y = new_y
 
@@ -137,55 +191,68 @@ class Ghost:
                     elif self.rect.centerx > SCREEN_WIDTH: # If ghost goes off right edge
                         self.rect.centerx = 0
             else:
-                # If hit a wall, choose a new direction immediately
-                self.choose_new_direction()
-
-            # Periodically choose a new direction even if not hitting a wall
-            if self.change_direction_timer >= 60: # Every second (60 frames)
-                self.change_direction_timer = 0
+                # Knocked off the grid (e.g. after being frightened), find a way back
                 self.choose_new_direction()
 
     def check_wall_collision(self, rect):
-        for y, row in enumerate(maze):
-            for x, char in enumerate(row):
-                if char == 'w':
-                    wall_rect = pygame.Rect(x * 40, y * 40, 40, 40)
-                    if rect.colliderect(wall_rect):
-                        return True
-        return False
+        return wall_grid.collides(rect)
+
+    def current_tile(self):
+        # The tile the ghost sits exactly on, or None when it is between tiles
+        if self.rect.x % TILE_SIZE == 0 and self.rect.y % TILE_SIZE == 0:
+            return (self.rect.x // TILE_SIZE, self.rect.y // TILE_SIZE)
+        return None
+
+    def choose_target_direction(self, tile):
+        reverse = (-self.dx, -self.dy)
+        exits = self.navigation.exits[tile]
+
+        # Corridors and corners have a single way forward
+        if tile not in self.navigation.junctions:
+            for direction, _ in exits:
+                if direction != reverse:
+                    self.dx, self.dy = direction
+                    return
+            self.dx, self.dy = reverse # Dead end
+            return
+
+        # At a junction, follow the shortest path unless that means turning back,
+        # in which case take the forward exit closest to the target
+        direction = self.navigation.next_hop(tile, self.target_tile)
+        if direction is None or direction == reverse:
+            forward = [(d, n) for d, n in exits if d != reverse]
+            direction = min(forward, key=lambda exit: self.navigation.distance(exit[1], self.target_tile))[0]
+        self.dx, self.dy = direction
 
     def choose_new_direction(self):
         valid_directions = []
         current_dx, current_dy = self.dx, self.dy
 
-        # Only allow turns if ghost is roughly aligned with the grid
+        # Only allow turns if ghost is aligned with a tile of the navigation graph
         # This prevents ghosts from turning mid-tile and getting stuck
-        if self.rect.x % 40 == 0 and self.rect.y % 40 == 0:
-            # Check all four directions
-            all_directions = [(1, 0), (-1, 0), (0, 1), (0, -1)]
-            for dx, dy in all_directions:
+        tile = self.current_tile()
+        if tile in self.navigation.exits:
+            if self.state == "active" and self.target_tile is not None:
+                self.choose_target_direction(tile)
+                return
+
+            for direction, _ in self.navigation.exits[tile]:
                 # Avoid reversing direction unless it's the only option
-                if (dx, dy) == (-current_dx, -current_dy) and len(valid_directions) > 0:
+                if direction == (-current_dx, -current_dy) and len(valid_directions) > 0:
                     continue
-
-                temp_rect = self.rect.copy()
-                temp_rect.x += dx * self.speed
-                temp_rect.y += dy * self.speed
-
-                if not self.check_wall_collision(temp_rect):
-                    valid_directions.append((dx, dy))
+                valid_directions.append(direction)
 
             if valid_directions:
                 # Prioritize continuing straight or turning, then reversing
-                if (current_dx, current_dy) in valid_directions and random.random() < 0.8: # 80% chance to continue straight
+                if (current_dx, current_dy) in valid_directions and self.rng.random() < 0.8: # 80% chance to continue straight
                     self.dx, self.dy = current_dx, current_dy
                 else:
                     # Filter out reversing direction if other options exist
                     non_reverse_directions = [d for d in valid_directions if d != (-current_dx, -current_dy)]
                     if non_reverse_directions:
-                        self.dx, self.dy = random.choice(non_reverse_directions)
+                        self.dx, self.dy = self.rng.choice(non_reverse_directions)
                     else:
-                        self.dx, self.dy = random.choice(valid_directions) # Only reverse if no other choice
+                        self.dx, self.dy = self.rng.choice(valid_directions) # Only reverse if no other choice
             else:
                 # If completely stuck, reverse direction
                 self.dx, self.dy = -current_dx, -current_dy
@@ -194,7 +261,7 @@ class Ghost:
             temp_rect = self.rect.copy()
             temp_rect.x += current_dx * self.speed
             temp_rect.y += current_dy * self.speed
-            if not self.check_wall_collision(temp_rect):
+            if (current_dx or current_dy) and not self.check_wall_collision(temp_rect):
                 pass # Continue in current direction
             else:
                 # If current direction is blocked, try to find any valid direction
@@ -224,23 +291,19 @@ class Player:
         center_y = self.rect.centery
 
         if self.mouth_open:
-            # Adjust the arc drawing to be centered on the original tile
-            if self.direction == 0:
-                pygame.draw.arc(screen, YELLOW, (center_x - 20, center_y - 20, 40, 40), 0.5, -0.5, 20)
-            elif self.direction == 1:
-                pygame.draw.arc(screen, YELLOW, (center_x - 20, center_y - 20, 40, 40), 3.6, 2.6, 20)
-            elif self.direction == 2:
-                pygame.draw.arc(screen, YELLOW, (center_x - 20, center_y - 20, 40, 40), 2.1, 1.1, 20)
-            elif self.direction == 3:
-                pygame.draw.arc(screen, YELLOW, (center_x - 20, center_y - 20, 40, 40), 5.2, 4.2, 20)
+            sprite = get_player_sprite(self.direction)
         else:
-            pygame.draw.circle(screen, YELLOW, (center_x, center_y), 20)
+            sprite = get_player_sprite(None)
+        screen.blit(sprite, (center_x - 20, center_y - 20))
 
         self.mouth_timer += 1
         if self.mouth_timer >= 10:
             self.mouth_open = not self.mouth_open
             self.mouth_timer = 0
 
+        # Area touched by the drawing (the full 40x40 tile around the rect)
+        return pygame.Rect(center_x - 20, center_y - 20, 40, 40)
+
     def move(self, dx, dy):
         # Update direction based on input
         if dx > 0:
@@ -254,15 +317,12 @@ class Player:
 
         # Move in X direction
         self.rect.x += dx
-        for y, row in enumerate(maze):
-            for x, char in enumerate(row):
-                if char == 'w':
-                    wall_rect = pygame.Rect(x * 40, y * 40, 40, 40)
-                    if self.rect.colliderect(wall_rect):
-                        if dx > 0: # Moving right
-                            self.rect.right = wall_rect.left
-                        elif dx < 0: # Moving left
-                            self.rect.left = wall_rect.right
+        for wall_rect in wall_grid.overlapping_walls(self.rect):
+            if self.rect.colliderect(wall_rect):
+                if dx > 0: # Moving right
+                    self.rect.right = wall_rect.left
+                elif dx < 0: # Moving left
+                    self.rect.left = wall_rect.right
 
         # Implement wormhole effect
         # Check if Pac-Man is in a wormhole row (rows 4 and 10)
@@ -275,15 +335,12 @@ class Player:
 
         # Move in Y direction
         self.rect.y += dy
-        for y, row in enumerate(maze):
-            for x, char in enumerate(row):
-                if char == 'w':
-                    wall_rect = pygame.Rect(x * 40, y * 40, 40, 40)
-                    if self.rect.colliderect(wall_rect):
-                        if dy > 0: # Moving down
-                            self.rect.bottom = wall_rect.top
-                        elif dy < 0: # Moving up
-                            self.rect.top = wall_rect.bottom
+        for wall_rect in wall_grid.overlapping_walls(self.rect):
+            if self.rect.colliderect(wall_rect):
+                if dy > 0: # Moving down
+                    self.rect.bottom = wall_rect.top
+                elif dy < 0: # Moving up
+                    self.rect.top = wall_rect.bottom
 
 
 # Pellet class
@@ -327,6 +384,144 @@ maze = [
 ]
 
 
+# Tiles (x, y) that a rect overlaps, in row-major order; 1-4 tiles for an actor
+def covered_tiles(rect):
+    left = rect.left // TILE_SIZE
+    right = (rect.right - 1) // TILE_SIZE
+    top = rect.top // TILE_SIZE
+    bottom = (rect.bottom - 1) // TILE_SIZE
+    for tile_y in range(top, bottom + 1):
+        for tile_x in range(left, right + 1):
+            yield tile_x, tile_y
+
+
+# Wall index: a boolean tile grid built once from the maze, so collision
+# checks only look at the tiles a rect actually covers
+class WallGrid:
+    def __init__(self, maze):
+        self.height = len(maze)
+        self.width = max(len(row) for row in maze)
+        # Short rows are padded with open tiles
+        self.cells = [[x < len(row) and row[x] == 'w' for x in range(self.width)] for row in maze]
+
+    def is_wall(self, tile_x, tile_y):
+        # Anything outside the maze (e.g. past a wormhole edge) is open
+        if 0 <= tile_x < self.width and 0 <= tile_y < self.height:
+            return self.cells[tile_y][tile_x]
+        return False
+
+    def overlapping_walls(self, rect):
+        # Yield the wall tiles under rect, in the same row-major order as the maze
+        for tile_x, tile_y in covered_tiles(rect):
+            if self.is_wall(tile_x, tile_y):
+                yield pygame.Rect(tile_x * TILE_SIZE, tile_y * TILE_SIZE, TILE_SIZE, TILE_SIZE)
+
+    def collides(self, rect):
+        for _ in self.overlapping_walls(rect):
+            return True
+        return False
+
+
+wall_grid = WallGrid(maze)
+
+
+# Rows whose open ends wrap around to the other side of the screen
+WORMHOLE_ROWS = (4, 10)
+
+# Ghost direction priority when several exits are equally good: up, left, down, right
+DIRECTIONS = [(0, -1), (-1, 0), (0, 1), (1, 0)]
+
+
+# Navigation graph of the walkable tiles, built once per maze, with an
+# all-pairs shortest path table so ghosts can target tiles with O(1) lookups
+class MazeNavigation:
+    def __init__(self, wall_grid, wormhole_rows):
+        self.width = wall_grid.width
+        self.height = wall_grid.height
+        self.tiles = [(x, y) for y in range(self.height) for x in range(self.width) if not wall_grid.is_wall(x, y)]
+        self.index = {tile: i for i, tile in enumerate(self.tiles)}
+
+        # tile -> [(direction, neighbour tile), ...]; wormhole rows wrap horizontally
+        self.exits = {}
+        for x, y in self.tiles:
+            exits = []
+            for dx, dy in DIRECTIONS:
+                nx, ny = x + dx, y + dy
+                if y in wormhole_rows:
+                    nx %= self.width
+                if (nx, ny) in self.index:
+                    exits.append(((dx, dy), (nx, ny)))
+            self.exits[(x, y)] = exits
+
+        # Tiles where a ghost has a real choice to make
+        self.junctions = {tile for tile, exits in self.exits.items() if len(exits) > 2}
+
+        # distances[i][j] is the path length from tiles[i] to tiles[j] and
+        # next_hops[i][j] the direction of the first step; one BFS per tile
+        self.distances = []
+        self.next_hops = []
+        for source in self.tiles:
+            distances, next_hops = self.search_from(source)
+            self.distances.append(distances)
+            self.next_hops.append(next_hops)
+
+        # Nearest walkable tile for every cell of the grid, so targets that land
+        # on a wall or outside the maze still have a distance
+        self.nearest = {tile: tile for tile in self.tiles}
+        frontier = list(self.tiles)
+        while frontier:
+            next_frontier = []
+            for x, y in frontier:
+                for dx, dy in DIRECTIONS:
+                    cell = (x + dx, y + dy)
+                    if 0 <= cell[0] < self.width and 0 <= cell[1] < self.height and cell not in self.nearest:
+                        self.nearest[cell] = self.nearest[(x, y)]
+                        next_frontier.append(cell)
+            frontier = next_frontier
+
+    def search_from(self, source):
+        unreachable = len(self.tiles)
+        distances = [unreachable] * len(self.tiles)
+        next_hops = [None] * len(self.tiles)
+        distances[self.index[source]] = 0
+        frontier = [source]
+        while frontier:
+            next_frontier = []
+            for tile in frontier:
+                i = self.index[tile]
+                for direction, neighbour in self.exits[tile]:
+                    j = self.index[neighbour]
+                    if distances[j] == unreachable:
+                        distances[j] = distances[i] + 1
+                        # First step is inherited from the tile we came through
+                        next_hops[j] = direction if tile == source else next_hops[i]
+                        next_frontier.append(neighbour)
+            frontier = next_frontier
+        return distances, next_hops
+
+    def nearest_tile(self, x, y):
+        x = min(max(x, 0), self.width - 1)
+        y = min(max(y, 0), self.height - 1)
+        return self.nearest.get((x, y))
+
+    def distance(self, source, target):
+        return self.distances[self.index[source]][self.index[target]]
+
+    def next_hop(self, source, target):
+        return self.next_hops[self.index[source]][self.index[target]]
+
+
+# The all-pairs table takes tens of milliseconds to build, so it is made the
+# first time a game needs it rather than when the module is imported
+navigation = None
+
+def get_navigation():
+    global navigation
+    if navigation is None:
+        navigation = MazeNavigation(wall_grid, WORMHOLE_ROWS)
+    return navigation
+
+
 
 # Draw the maze
 def draw_maze_walls(screen):
@@ -335,139 +530,341 @@ def draw_maze_walls(screen):
             if char == 'w':
                 pygame.draw.rect(screen, BLUE, (x * 40, y * 40, 40, 40))
 
-# Create pellets
-def create_pellets():
+# Render the static maze once into a background surface
+def create_background():
+    background = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT)).convert()
+    background.fill((0, 0, 0))
+    draw_maze_walls(background)
+    return background
+
+# Create pellets, keyed by the maze tile they sit in
+def create_pellets(verbose=False):
+    pellets = {} # (tile_x, tile_y) -> Pellet or PowerPellet still on the board
     for y, row in enumerate(maze):
         for x, char in enumerate(row):
             if char == ' ':
-                pellets.append(Pellet(x * 40 + 20, y * 40 + 20))
-                print(f"Added Pellet at ({x*40+20}, {y*40+20})")
+                pellets[(x, y)] = Pellet(x * 40 + 20, y * 40 + 20)
+                if verbose:
+                    print(f"Added Pellet at ({x*40+20}, {y*40+20})")
             elif char == 'P':
-                pellets.append(PowerPellet(x * 40 + 20, y * 40 + 20))
-                print(f"Added PowerPellet at ({x*40+20}, {y*40+20})")
-
+                pellets[(x, y)] = PowerPellet(x * 40 + 20, y * 40 + 20)
+                if verbose:
+                    print(f"Added PowerPellet at ({x*40+20}, {y*40+20})")
+    return pellets
+
+# Pellets the player is touching; only the tiles under the player are looked at
+def pellets_under(pellets, rect):
+    for tile in covered_tiles(rect):
+        pellet = pellets.get(tile)
+        if pellet is not None and rect.colliderect(pellet.rect):
+            yield tile, pellet
+
+
+# Ghost modes as (mode, frames); the last chase phase never ends
+GHOST_MODE_SCHEDULE = [
+    ("scatter", 7 * 60),
+    ("chase", 20 * 60),
+    ("scatter", 7 * 60),
+    ("chase", 20 * 60),
+    ("scatter", 5 * 60),
+    ("chase", 20 * 60),
+    ("scatter", 5 * 60),
+    ("chase", None),
+]
 
+# Unit vector for Player.direction (0: right, 1: left, 2: up, 3: down)
+PLAYER_FACING = [(1, 0), (-1, 0), (0, -1), (0, 1)]
 
 
-# Game loop
-player = Player(40, 40)
-pellets = []
-create_pellets()
+# Player actions for PacmanGame.step; combine with | to hold several keys
+STAY = 0
+LEFT = 1
+RIGHT = 2
+UP = 4
+DOWN = 8
 
-ghosts = [
-    Ghost(360, 200, RED, 0), # Blinky (red) - spawns immediately
-    Ghost(400, 200, (0, 255, 255), 180), # Inky (cyan) - spawns after 3 seconds (180 frames)
-    Ghost(440, 200, (255, 184, 255), 360), # Pinky (pink) - spawns after 6 seconds
-    Ghost(480, 200, (255, 184, 82), 540) # Clyde (orange) - spawns after 9 seconds
+# Pixels moved per tick for each action, applied in this order
+ACTION_MOVES = [
+    (LEFT, (-2, 0)),
+    (RIGHT, (2, 0)),
+    (UP, (0, -2)),
+    (DOWN, (0, 2)),
 ]
 
-clock = pygame.time.Clock()
-FPS = 60
 
-game_time = 0 # Keep track of game time in frames
-frightened_timer = 0 # Timer for frightened ghost state
-score = 0 # Game score
-print(f"Initial score: {score}")
+# Game simulation: everything that happens in one tick, with no display,
+# keyboard or clock dependency so games can be run headless and uncapped
+class PacmanGame:
+    def __init__(self, seed=None, verbose=False):
+        self.rng = random.Random(seed)
+        self.navigation = get_navigation()
+        self.player = Player(40, 40)
+        self.pellets = create_pellets(verbose)
+
+        self.ghosts = [
+            Ghost(360, 200, RED, 0, self.rng, "blinky"), # Blinky (red) - spawns immediately
+            Ghost(400, 200, (0, 255, 255), 180, self.rng, "inky"), # Inky (cyan) - spawns after 3 seconds (180 frames)
+            Ghost(440, 200, (255, 184, 255), 360, self.rng, "pinky"), # Pinky (pink) - spawns after 6 seconds
+            Ghost(480, 200, (255, 184, 82), 540, self.rng, "clyde") # Clyde (orange) - spawns after 9 seconds
+        ]
+        self.blinky = self.ghosts[0] # Inky aims relative to Blinky
+
+        # Scatter corners, one per personality
+        right = self.navigation.width - 1
+        bottom = self.navigation.height - 1
+        self.scatter_tiles = {
+            "blinky": self.navigation.nearest_tile(right, 0),
+            "pinky": self.navigation.nearest_tile(0, 0),
+            "inky": self.navigation.nearest_tile(right, bottom),
+            "clyde": self.navigation.nearest_tile(0, bottom),
+        }
+        self.mode_index = 0 # Position in GHOST_MODE_SCHEDULE
+        self.mode_timer = 0 # Frames spent in the current mode
+
+        self.game_time = 0 # Keep track of game time in frames
+        self.frightened_timer = 0 # Timer for frightened ghost state
+        self.score = 0 # Game score
+        self.game_over = False
+        self.eaten_rects = [] # Pellets eaten during the last step, for the renderer
+
+    def step(self, action=STAY):
+        if self.game_over:
+            return
 
-running = True
-game_over = False
-while running:
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
+        # Move the player
+        for flag, (dx, dy) in ACTION_MOVES:
+            if action & flag:
+                self.player.move(dx, dy)
 
-    # Move the player
-    keys = pygame.key.get_pressed()
+        # Check for collisions with pellets
+        self.eaten_rects = []
+        for tile, pellet in list(pellets_under(self.pellets, self.player.rect)):
+            if isinstance(pellet, PowerPellet):
+                self.frighten_ghosts()
+                # Start frightened timer
+                self.frightened_timer = 360 # 6 seconds
+                self.score += 50 # Power pellet score
+            else:
+                self.score += 10 # Regular pellet score
+            del self.pellets[tile]
+            self.eaten_rects.append(pellet.rect)
+
+        # Update frightened timer
+        if self.frightened_timer > 0:
+            self.frightened_timer -= 1
+            if self.frightened_timer == 0:
+                self.calm_ghosts()
+
+        # Update game time
+        self.game_time += 1
+
+        # Switch between scatter and chase (the schedule pauses while frightened)
+        if self.frightened_timer == 0:
+            self.mode_timer += 1
+            duration = GHOST_MODE_SCHEDULE[self.mode_index][1]
+            if duration is not None and self.mode_timer >= duration:
+                self.mode_index += 1
+                self.mode_timer = 0
+
+        self.update_ghosts()
+        self.check_ghost_collisions()
+
+    # Ghost hooks; a different ghost engine (see pacman_horde.py) overrides these
+
+    def frighten_ghosts(self):
+        for ghost in self.ghosts:
+            if ghost.state == "active":
+                ghost.state = "frightened"
+
+    def calm_ghosts(self):
+        for ghost in self.ghosts:
+            if ghost.state == "frightened":
+                ghost.state = "active"
+
+    def update_ghosts(self):
+        # Activate ghosts based on spawn time
+        for ghost in self.ghosts:
+            if ghost.state == "waiting" and self.game_time >= ghost.spawn_time:
+                ghost.state = "exiting_house"
+
+        # Aim the active ghosts, then move them
+        for ghost in self.ghosts:
+            if ghost.state == "active":
+                ghost.target_tile = self.ghost_target(ghost)
+            ghost.move()
+
+    def check_ghost_collisions(self):
+        # Check for collisions between player and ghosts
+        for ghost in self.ghosts:
+            if self.player.rect.colliderect(ghost.rect):
+                if ghost.state == "frightened":
+                    ghost.state = "eaten"
+                    ghost.rect.x = 360 # Send back to ghost house
+                    ghost.rect.y = 200
+                    self.score += 200 # Score for eating a ghost
+                elif ghost.state == "active":
+                    self.game_over = True
+
+    def draw_ghosts(self, screen):
+        return [ghost.draw(screen) for ghost in self.ghosts]
+
+    def ghost_mode(self):
+        return GHOST_MODE_SCHEDULE[self.mode_index][0]
+
+    def ghost_target(self, ghost):
+        if self.ghost_mode() == "scatter":
+            return self.scatter_tiles[ghost.personality]
+
+        player_x = self.player.rect.centerx // TILE_SIZE
+        player_y = self.player.rect.centery // TILE_SIZE
+        facing_x, facing_y = PLAYER_FACING[self.player.direction]
+
+        if ghost.personality == "pinky":
+            # Four tiles ahead of Pac-Man
+            return self.navigation.nearest_tile(player_x + 4 * facing_x, player_y + 4 * facing_y)
+        elif ghost.personality == "inky":
+            # Double the vector from Blinky to two tiles ahead of Pac-Man
+            ahead_x = player_x + 2 * facing_x
+            ahead_y = player_y + 2 * facing_y
+            blinky_x = self.blinky.rect.centerx // TILE_SIZE
+            blinky_y = self.blinky.rect.centery // TILE_SIZE
+            return self.navigation.nearest_tile(2 * ahead_x - blinky_x, 2 * ahead_y - blinky_y)
+
+        player_tile = self.navigation.nearest_tile(player_x, player_y)
+        if ghost.personality == "clyde":
+            # Chases from afar but retreats to his corner when within 8 tiles
+            ghost_tile = self.navigation.nearest_tile(ghost.rect.centerx // TILE_SIZE, ghost.rect.centery // TILE_SIZE)
+            if self.navigation.distance(ghost_tile, player_tile) < 8:
+                return self.scatter_tiles["clyde"]
+        # Blinky heads straight for Pac-Man
+        return player_tile
+
+
+# Run one game headless as fast as possible. policy(game) returns the action
+# for each tick (no input by default); stops on game over, a cleared board or
+# after max_ticks. game_class(seed) builds the game, e.g. a horde level
+def simulate(policy=None, seed=None, max_ticks=60 * 60 * 5, game_class=PacmanGame):
+    game = game_class(seed)
+    loop = GameLoop(TICK_RATE, uncapped=True)
+
+    def update():
+        game.step(policy(game) if policy else STAY)
+        if game.game_over or not game.pellets:
+            loop.stop()
+
+    if not game.game_over and game.pellets:
+        loop.run(update, max_ticks=max_ticks)
+    return game
+
+
+def action_from_keys(keys):
+    action = STAY
     if keys[pygame.K_LEFT]:
-        player.move(-2, 0)
+        action |= LEFT
     if keys[pygame.K_RIGHT]:
-        player.move(2, 0)
+        action |= RIGHT
     if keys[pygame.K_UP]:
-        player.move(0, -2)
+        action |= UP
     if keys[pygame.K_DOWN]:
-        player.move(0, 2)
+        action |= DOWN
+    return action
+
+
+# Draws a game with dirty rects: only what changed since the last frame is
+# redrawn and sent to the display
+class PacmanView:
+    def __init__(self, screen, game):
+        self.screen = screen
+        self.game = game
+
+        # The background holds the walls only; the board adds the pellets that
+        # are still alive and is what actors get erased back to every frame
+        self.background = create_background()
+        self.board = self.background.copy()
+        for pellet in game.pellets.values():
+            pellet.draw(self.board)
+
+        self.score_font = pygame.font.Font(None, 36)
+        self.score_text = self.score_font.render(f"Score: {game.score}", True, WHITE)
+        self.drawn_score = game.score
+
+        # Screen areas drawn over the board last frame, erased before the next
+        # one, and pellets eaten by ticks since then
+        self.previous_rects = []
+        self.eaten_rects = []
+        screen.blit(self.board, (0, 0))
+        pygame.display.flip()
 
-    # Check for collisions with pellets
-    for pellet in pellets:
-        if player.rect.colliderect(pellet.rect):
-            if isinstance(pellet, PowerPellet):
-                for ghost in ghosts:
-                    if ghost.state == "active":
-                        ghost.state = "frightened"
-                # Start frightened timer
-                frightened_timer = 360 # 6 seconds
-                score += 50 # Power pellet score
-            else:
-                score += 10 # Regular pellet score
-            pellets.remove(pellet)
-
-    # Update frightened timer
-    if frightened_timer > 0:
-        frightened_timer -= 1
-        if frightened_timer == 0:
-            for ghost in ghosts:
-                if ghost.state == "frightened":
-                    ghost.state = "active"
+    def collect_eaten(self):
+        # Call after every tick: a frame may follow several ticks
+        self.eaten_rects.extend(self.game.eaten_rects)
 
-    # Update game time
-    game_time += 1
+    def draw(self):
+        screen = self.screen
+        game = self.game
 
-    # Activate ghosts based on spawn time
-    for ghost in ghosts:
-        if ghost.state == "waiting" and game_time >= ghost.spawn_time:
-            ghost.state = "exiting_house"
+        # Remove eaten pellets from the board
+        for rect in self.eaten_rects:
+            self.board.blit(self.background, rect, rect)
 
-    # Move the ghosts
-    for ghost in ghosts:
-        ghost.move()
+        # Erase last frame's actors and score, plus the eaten pellets
+        dirty_rects = self.previous_rects + self.eaten_rects
+        self.eaten_rects = []
+        for rect in dirty_rects:
+            screen.blit(self.board, rect, rect)
 
-    # Check for collisions between player and ghosts
-    for ghost in ghosts:
-        if player.rect.colliderect(ghost.rect):
-            if ghost.state == "frightened":
-                ghost.state = "eaten"
-                ghost.rect.x = 360 # Send back to ghost house
-                ghost.rect.y = 200
-                score += 200 # Score for eating a ghost
-            elif ghost.state == "active":
-                game_over = True
-
-    if game_over:
-        font = pygame.font.Font(None, 74)
-        text = font.render("Game Over!", True, RED)
-        text_rect = text.get_rect(center=(SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2))
-        screen.blit(text, text_rect)
-        pygame.display.flip()
-        pygame.time.wait(3000) # Wait for 3 seconds
-        running = False
+        # Draw the player
+        drawn_rects = [game.player.draw(screen)]
+
+        # Draw the ghosts
+        drawn_rects.extend(game.draw_ghosts(screen))
+
+        # Display score (only re-rendered when it changes)
+        if game.score != self.drawn_score:
+            self.score_text = self.score_font.render(f"Score: {game.score}", True, WHITE)
+            self.drawn_score = game.score
+        drawn_rects.append(screen.blit(self.score_text, (5, 5)))
+
+        # Update only the areas that changed
+        pygame.display.update(dirty_rects + drawn_rects)
+        self.previous_rects = drawn_rects
 
-    # Fill the background with black
-    screen.fill((0, 0, 0))
 
-    # Draw the maze
-    draw_maze_walls(screen)
+# Game loop; make_game builds the game to play (the classic four ghosts by default)
+def main(make_game=None):
+    # Create the screen
+    screen = open_window((SCREEN_WIDTH, SCREEN_HEIGHT), "Pac-Man")
 
-    # Draw the player
-    player.draw(screen)
+    game = make_game() if make_game else PacmanGame()
+    loop = GameLoop(TICK_RATE)
+    view = PacmanView(screen, game)
 
-    # Draw the pellets
-    for pellet in pellets:
-        pellet.draw(screen)
+    print(f"Initial score: {game.score}")
 
-    # Draw the ghosts
-    for ghost in ghosts:
-        ghost.draw(screen)
+    def update():
+        # Advance the simulation with the keys currently held
+        game.step(action_from_keys(pygame.key.get_pressed()))
+        view.collect_eaten()
+        if game.game_over:
+            loop.stop()
 
-    # Display score
-    font = pygame.font.Font(None, 36)
-    text = font.render(f"Score: {score}", True, WHITE)
-    screen.blit(text, (5, 5))
+    def render(alpha):
+        view.draw()
+
+    loop.run(update, render)
+
+    if game.game_over:
+        view.draw()
+        font = pygame.font.Font(None, 74)
+        text = font.render("Game Over!", True, RED)
+        text_rect = text.get_rect(center=(SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2))
+        screen.blit(text, text_rect)
+        pygame.display.flip()
+        pygame.time.wait(3000) # Wait for 3 seconds
 
-    # Update the display
-    pygame.display.flip()
+    # Quit Pygame
+    pygame.quit()
 
-    # Cap the frame rate
-    clock.tick(FPS)
 
-# Quit Pygame
-pygame.quit()
+if __name__ == "__main__":
+    main()
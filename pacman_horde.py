@@ -0,0 +1,244 @@
+
+import sys
+
+import numpy as np
+
+from pacman import (
+    DIRECTIONS,
+    RED,
+    SCREEN_WIDTH,
+    TILE_SIZE,
+    WORMHOLE_ROWS,
+    PacmanGame,
+    get_ghost_sprite,
+    get_navigation,
+    main,
+    wall_grid,
+)
+
+# Ghost states, stored as small ints so the whole horde can be masked at once
+WAITING = 0
+EXITING = 1
+ACTIVE = 2
+FRIGHTENED = 3
+EATEN = 4
+STATE_NAMES = ["waiting", "exiting_house", "active", "frightened", "eaten"]
+
+GHOST_COLORS = [RED, (0, 255, 255), (255, 184, 255), (255, 184, 82)]
+
+# Ghost house spots the horde spawns from (same as the classic four) and the
+# tile-aligned spot above the house where they leave it
+HOUSE_SPOTS = [(360, 200), (400, 200), (440, 200), (480, 200)]
+EXIT_X = 360
+RESPAWN_FRAMES = 180 # 3 seconds in the house after being eaten
+
+# Unit steps for each index into DIRECTIONS (up, left, down, right)
+DIRECTION_DX = np.array([dx for dx, _ in DIRECTIONS], dtype=np.int32)
+DIRECTION_DY = np.array([dy for _, dy in DIRECTIONS], dtype=np.int32)
+NO_DIRECTION = -1
+
+
+# The navigation graph and wall grid as arrays, for vectorized lookups
+class NavigationArrays:
+    def __init__(self, navigation, wall_grid):
+        tile_count = len(navigation.tiles)
+
+        # tile_index[y, x] is the graph index of a walkable tile, -1 for walls
+        self.tile_index = np.full((navigation.height, navigation.width), -1, dtype=np.int32)
+        for i, (x, y) in enumerate(navigation.tiles):
+            self.tile_index[y, x] = i
+
+        # neighbours[i, d] is the tile reached by leaving tile i in direction d, or -1
+        self.neighbours = np.full((tile_count, len(DIRECTIONS)), -1, dtype=np.int32)
+        for tile, exits in navigation.exits.items():
+            for direction, neighbour in exits:
+                self.neighbours[navigation.index[tile], DIRECTIONS.index(direction)] = navigation.index[neighbour]
+
+        self.distances = np.array(navigation.distances, dtype=np.int32)
+
+        # Walls with an open margin of two tiles, so rects that are partly off
+        # screen in a wormhole can be looked up without bounds checks
+        self.margin = 2
+        self.walls = np.zeros((wall_grid.height + 2 * self.margin, wall_grid.width + 2 * self.margin), dtype=bool)
+        self.walls[self.margin:-self.margin, self.margin:-self.margin] = wall_grid.cells
+
+    def collides(self, x, y):
+        # Same test as WallGrid.collides for 40x40 rects; they cover at most 2x2 tiles
+        rows, cols = self.walls.shape
+        left = np.clip(x // TILE_SIZE + self.margin, 0, cols - 1)
+        right = np.clip((x + TILE_SIZE - 1) // TILE_SIZE + self.margin, 0, cols - 1)
+        top = np.clip(y // TILE_SIZE + self.margin, 0, rows - 1)
+        bottom = np.clip((y + TILE_SIZE - 1) // TILE_SIZE + self.margin, 0, rows - 1)
+        return self.walls[top, left] | self.walls[top, right] | self.walls[bottom, left] | self.walls[bottom, right]
+
+    def tiles_at(self, x, y):
+        # Graph index of the tile each rect sits exactly on, -1 when between tiles
+        rows, cols = self.tile_index.shape
+        tile_x = x // TILE_SIZE
+        tile_y = y // TILE_SIZE
+        on_grid = (x % TILE_SIZE == 0) & (y % TILE_SIZE == 0) & \
+                  (tile_x >= 0) & (tile_x < cols) & (tile_y >= 0) & (tile_y < rows)
+        tiles = np.full(x.shape, -1, dtype=np.int32)
+        tiles[on_grid] = self.tile_index[tile_y[on_grid], tile_x[on_grid]]
+        return tiles
+
+
+# Batched ghost engine: every ghost is a row in a set of NumPy arrays and the
+# whole horde advances with one vectorized step per tick
+class GhostHorde:
+    def __init__(self, count, spawn_interval=10, seed=None):
+        self.count = count
+        self.rng = np.random.default_rng(seed)
+        navigation = get_navigation()
+        self.nav = NavigationArrays(navigation, wall_grid)
+
+        spots = np.arange(count) % len(HOUSE_SPOTS)
+        self.home_x = np.array([HOUSE_SPOTS[i][0] for i in spots], dtype=np.int32)
+        self.home_y = np.array([HOUSE_SPOTS[i][1] for i in spots], dtype=np.int32)
+        self.x = self.home_x.copy()
+        self.y = self.home_y.copy()
+        self.direction = np.full(count, NO_DIRECTION, dtype=np.int32)
+        self.state = np.full(count, WAITING, dtype=np.int8)
+        self.spawn_time = np.arange(count, dtype=np.int32) * spawn_interval
+        self.respawn_timer = np.zeros(count, dtype=np.int32)
+        self.color = np.arange(count) % len(GHOST_COLORS)
+
+        # Scatter corners are shared out round-robin like the classic personalities
+        right = navigation.width - 1
+        bottom = navigation.height - 1
+        corners = [(right, 0), (0, 0), (right, bottom), (0, bottom)]
+        corner_tiles = [navigation.index[navigation.nearest_tile(x, y)] for x, y in corners]
+        self.scatter_tile = np.array(corner_tiles, dtype=np.int32)[np.arange(count) % len(corners)]
+
+    def frighten(self):
+        self.state[self.state == ACTIVE] = FRIGHTENED
+
+    def calm(self):
+        self.state[self.state == FRIGHTENED] = ACTIVE
+
+    def update(self, game_time, target_tile, scatter):
+        state = self.state
+
+        # Activate ghosts based on spawn time
+        state[(state == WAITING) & (game_time >= self.spawn_time)] = EXITING
+
+        # Leave the house sideways to the exit spot, then start roaming
+        exiting = state == EXITING
+        self.x[exiting] += np.sign(EXIT_X - self.x[exiting]).astype(np.int32)
+        out = exiting & (self.x == EXIT_X)
+        state[out] = ACTIVE
+        self.direction[out] = NO_DIRECTION
+
+        # Eaten ghosts sit in the house until they respawn
+        eaten = state == EATEN
+        self.respawn_timer[eaten] += 1
+        respawned = eaten & (self.respawn_timer >= RESPAWN_FRAMES)
+        state[respawned] = WAITING
+        self.respawn_timer[respawned] = 0
+
+        # Frightened ghosts move at half speed: every other tick
+        roaming = (state == ACTIVE) | ((state == FRIGHTENED) & (game_time % 2 == 0))
+        self.choose_directions(roaming, target_tile, scatter)
+        self.advance(roaming)
+
+    def choose_directions(self, roaming, target_tile, scatter):
+        tiles = self.nav.tiles_at(self.x, self.y)
+        deciding = np.nonzero(roaming & (tiles >= 0))[0]
+        if deciding.size == 0:
+            return
+
+        neighbours = self.nav.neighbours[tiles[deciding]]
+        open_exits = neighbours >= 0
+
+        # No turning back unless it's a dead end
+        current = self.direction[deciding]
+        reverse = np.where(current >= 0, (current + 2) % len(DIRECTIONS), NO_DIRECTION)
+        forward = open_exits & (np.arange(len(DIRECTIONS)) != reverse[:, None])
+        dead_end = ~forward.any(axis=1)
+        forward[dead_end] = open_exits[dead_end]
+
+        # Active ghosts take the exit closest to their target (ties go up, left,
+        # down, right); frightened ones pick a random exit
+        targets = self.scatter_tile[deciding] if scatter else np.full(deciding.size, target_tile, dtype=np.int32)
+        scores = self.nav.distances[neighbours, targets[:, None]].astype(np.float64)
+        frightened = self.state[deciding] == FRIGHTENED
+        scores[frightened] = self.rng.random((int(frightened.sum()), len(DIRECTIONS)))
+        scores[~forward] = np.inf
+
+        choice = np.argmin(scores, axis=1).astype(np.int32)
+        self.direction[deciding] = np.where(forward.any(axis=1), choice, NO_DIRECTION)
+
+    def advance(self, roaming):
+        moving = roaming & (self.direction >= 0)
+        step = np.where(moving, self.direction, 0)
+        new_x = self.x + np.where(moving, DIRECTION_DX[step], 0)
+        new_y = self.y + np.where(moving, DIRECTION_DY[step], 0)
+
+        # Graph exits are always open, but never walk into a wall if knocked off it
+        blocked = moving & self.nav.collides(new_x, new_y)
+        self.x = np.where(blocked, self.x, new_x)
+        self.y = np.where(blocked, self.y, new_y)
+        self.direction[blocked] = (self.direction[blocked] + 2) % len(DIRECTIONS)
+
+        # Implement wormhole effect for ghosts
+        in_wormhole = moving & np.isin(self.y // TILE_SIZE, WORMHOLE_ROWS)
+        center_x = self.x + TILE_SIZE // 2
+        self.x[in_wormhole & (center_x < 0)] = SCREEN_WIDTH - TILE_SIZE // 2
+        self.x[in_wormhole & (center_x > SCREEN_WIDTH)] = -TILE_SIZE // 2
+
+    def collide(self, rect):
+        # Returns (ghosts eaten, whether an active ghost caught the player)
+        hit = (self.x < rect.right) & (self.x + TILE_SIZE > rect.left) & \
+              (self.y < rect.bottom) & (self.y + TILE_SIZE > rect.top)
+
+        eaten = hit & (self.state == FRIGHTENED)
+        self.state[eaten] = EATEN
+        self.x[eaten] = self.home_x[eaten] # Send back to ghost house
+        self.y[eaten] = self.home_y[eaten]
+        self.respawn_timer[eaten] = 0
+
+        caught = bool((hit & (self.state == ACTIVE)).any())
+        return int(eaten.sum()), caught
+
+    def draw(self, screen):
+        sprites = [[get_ghost_sprite(color, name) for name in STATE_NAMES] for color in GHOST_COLORS]
+        return screen.blits(
+            [(sprites[color][state], (x, y)) for color, state, x, y in
+             zip(self.color.tolist(), self.state.tolist(), self.x.tolist(), self.y.tolist())]
+        )
+
+
+# Pac-Man with the four classic ghosts swapped for a horde of any size
+class HordeGame(PacmanGame):
+    def __init__(self, seed=None, verbose=False, ghost_count=500, spawn_interval=10):
+        super().__init__(seed, verbose)
+        self.horde = GhostHorde(ghost_count, spawn_interval, seed)
+        self.ghosts = [] # The object ghosts are not used on horde levels
+
+    def frighten_ghosts(self):
+        self.horde.frighten()
+
+    def calm_ghosts(self):
+        self.horde.calm()
+
+    def update_ghosts(self):
+        # The whole horde chases Pac-Man's tile, or scatters to its corners
+        player_x = self.player.rect.centerx // TILE_SIZE
+        player_y = self.player.rect.centery // TILE_SIZE
+        target_tile = self.navigation.index[self.navigation.nearest_tile(player_x, player_y)]
+        self.horde.update(self.game_time, target_tile, self.ghost_mode() == "scatter")
+
+    def check_ghost_collisions(self):
+        eaten, caught = self.horde.collide(self.player.rect)
+        self.score += 200 * eaten # Score for eating a ghost
+        if caught:
+            self.game_over = True
+
+    def draw_ghosts(self, screen):
+        return self.horde.draw(screen)
+
+
+if __name__ == "__main__":
+    # Usage: python pacman_horde.py [ghost count]
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    main(lambda: HordeGame(ghost_count=count))
@@ -1,14 +1,19 @@
 
+import argparse
 import pygame
+import random
 import sys
 
-# Initialize Pygame
-pygame.init()
+from runtime import GameLoop, open_window
 
 # Screen dimensions
 WIDTH, HEIGHT = 800, 600
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Pong")
+screen = None # Opened by init_display
+
+# Game logic runs in fixed ticks; speeds are in pixels per tick
+TICK_RATE = 60
+PADDLE_SPEED = 7
+PADDLE_WIDTH, PADDLE_HEIGHT = 10, 140
 
 # Colors
 BLACK = (0, 0, 0)
@@ -16,90 +21,271 @@ WHITE = (255, 255, 255)
 
 # Game objects
 ball = pygame.Rect(WIDTH // 2 - 15, HEIGHT // 2 - 15, 30, 30)
-player1 = pygame.Rect(WIDTH - 20, HEIGHT // 2 - 70, 10, 140)
-player2 = pygame.Rect(10, HEIGHT // 2 - 70, 10, 140)
+player1 = pygame.Rect(WIDTH - 20, HEIGHT // 2 - PADDLE_HEIGHT // 2, PADDLE_WIDTH, PADDLE_HEIGHT)
+player2 = pygame.Rect(10, HEIGHT // 2 - PADDLE_HEIGHT // 2, PADDLE_WIDTH, PADDLE_HEIGHT)
 
 # Game variables
+# The ball's exact position; ball itself is rounded for drawing
+ball_x = float(ball.x)
+ball_y = float(ball.y)
 ball_speed_x = 7
 ball_speed_y = 7
 player1_speed = 0
-player2_speed = 7
+player2_speed = PADDLE_SPEED
 player1_score = 0
 player2_score = 0
-font = pygame.font.Font(None, 74)
-
-def ball_restart():
-    global ball_speed_x, ball_speed_y
-    ball.center = (WIDTH / 2, HEIGHT / 2)
-    ball_speed_y *= -1
-    ball_speed_x *= -1
-
-def main():
-    global ball_speed_x, ball_speed_y, player1_speed, player1_score, player2_score
-
-    while True:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_DOWN:
-                    player1_speed += 7
-                if event.key == pygame.K_UP:
-                    player1_speed -= 7
-            if event.type == pygame.KEYUP:
-                if event.key == pygame.K_DOWN:
-                    player1_speed -= 7
-                if event.key == pygame.K_UP:
-                    player1_speed += 7
-
-        # Ball movement
-        ball.x += ball_speed_x
-        ball.y += ball_speed_y
-
-        if ball.top <= 0 or ball.bottom >= HEIGHT:
-            ball_speed_y *= -1
-        if ball.left <= 0:
-            player1_score += 1
-            ball_restart()
-        if ball.right >= WIDTH:
-            player2_score += 1
-            ball_restart()
-
-        if ball.colliderect(player1) or ball.colliderect(player2):
-            ball_speed_x *= -1
-
-        # Player movement
-        player1.y += player1_speed
-        if player1.top <= 0:
-            player1.top = 0
-        if player1.bottom >= HEIGHT:
-            player1.bottom = HEIGHT
-
-        if player2.top < ball.y:
-            player2.top += player2_speed
-        if player2.bottom > ball.y:
-            player2.bottom -= player2_speed
-        if player2.top <= 0:
-            player2.top = 0
-        if player2.bottom >= HEIGHT:
-            player2.bottom = HEIGHT
-
-        # Drawing
-        screen.fill(BLACK)
-        pygame.draw.rect(screen, WHITE, player1)
-        pygame.draw.rect(screen, WHITE, player2)
-        pygame.draw.ellipse(screen, WHITE, ball)
-        pygame.draw.aaline(screen, WHITE, (WIDTH / 2, 0), (WIDTH / 2, HEIGHT))
-
-        player1_text = font.render(f"{player1_score}", True, WHITE)
-        screen.blit(player1_text, (WIDTH / 2 + 20, 10))
-
-        player2_text = font.render(f"{player2_score}", True, WHITE)
-        screen.blit(player2_text, (WIDTH / 2 - 45, 10))
-
-        pygame.display.flip()
-        pygame.time.Clock().tick(60)
+font = None
+
+# Most bounces handled within one step; a step only comes close to this when
+# the ball moves several times the height of the screen per step
+MAX_BOUNCES = 16
+
+def paddle_impact(x, y, speed_x, speed_y, size, paddle):
+    # Swept AABB test: time (in steps) at which a ball of the given size moving
+    # from (x, y) first touches the paddle, and the axis it hits ("x" for the
+    # face, "y" for the top or bottom); None if it doesn't hit while moving
+    # towards it. Done as a ray against the paddle grown by the ball's size
+    left, right = paddle.left - size, paddle.right
+    top, bottom = paddle.top - size, paddle.bottom
+
+    if speed_x > 0:
+        entry_x, exit_x = (left - x) / speed_x, (right - x) / speed_x
+    elif speed_x < 0:
+        entry_x, exit_x = (right - x) / speed_x, (left - x) / speed_x
+    elif left < x < right:
+        entry_x, exit_x = float("-inf"), float("inf")
+    else:
+        return None
+
+    if speed_y > 0:
+        entry_y, exit_y = (top - y) / speed_y, (bottom - y) / speed_y
+    elif speed_y < 0:
+        entry_y, exit_y = (bottom - y) / speed_y, (top - y) / speed_y
+    elif top < y < bottom:
+        entry_y, exit_y = float("-inf"), float("inf")
+    else:
+        return None
+
+    entry = max(entry_x, entry_y)
+    # Already overlapping (entry < 0) counts as no hit, so the ball can't get
+    # stuck bouncing back and forth inside a paddle
+    if entry < 0 or entry >= min(exit_x, exit_y):
+        return None
+    return entry, "x" if entry_x >= entry_y else "y"
+
+def move_ball(x, y, speed_x, speed_y, dt=1.0, paddles=None, size=None):
+    # Advance the ball's top-left corner by dt steps, bouncing off the walls
+    # and paddles at their exact time of impact, as many times as needed.
+    # Returns (x, y, speed_x, speed_y, goal) where goal is "left" or "right"
+    # when the ball reached that edge of the screen (it stops there), else None
+    paddles = (player1, player2) if paddles is None else paddles
+    size = ball.width if size is None else size
+    remaining = dt
+    for _ in range(MAX_BOUNCES):
+        # Earliest event: (time, what was hit, the paddle's axis)
+        hit = None
+        if speed_y < 0:
+            hit = (-y / speed_y, "wall", "y")
+        elif speed_y > 0:
+            hit = ((HEIGHT - size - y) / speed_y, "wall", "y")
+        if speed_x < 0:
+            goal = (-x / speed_x, "left", "x")
+        elif speed_x > 0:
+            goal = ((WIDTH - size - x) / speed_x, "right", "x")
+        else:
+            goal = None
+        if goal and (hit is None or goal[0] < hit[0]):
+            hit = goal
+        for paddle in paddles:
+            impact = paddle_impact(x, y, speed_x, speed_y, size, paddle)
+            if impact and (hit is None or impact[0] < hit[0]):
+                hit = (impact[0], "paddle", impact[1])
+
+        if hit is None or hit[0] > remaining:
+            break
+        time, what, axis = hit
+        x += speed_x * time
+        y += speed_y * time
+        remaining -= time
+        if what in ("left", "right"):
+            return x, y, speed_x, speed_y, what
+        if axis == "x":
+            speed_x = -speed_x
+        else:
+            speed_y = -speed_y
+
+    return x + speed_x * remaining, y + speed_y * remaining, speed_x, speed_y, None
+
+def play_tick(x, y, speed_x, speed_y, left, right, left_move=0, right_move=0, size=None):
+    # One tick of the game: the ball moves against the left and right paddle
+    # Rects where they are, a goal puts it back in the middle heading back the
+    # way it came, then each paddle moves by its move in pixels and is kept on
+    # screen. The paddles aren't changed; returns (x, y, speed_x, speed_y,
+    # left paddle's y, right paddle's y, goal) with goal as from move_ball
+    size = ball.width if size is None else size
+    x, y, speed_x, speed_y, goal = move_ball(x, y, speed_x, speed_y, paddles=(right, left), size=size)
+    if goal:
+        x, y = WIDTH / 2 - size / 2, HEIGHT / 2 - size / 2
+        speed_x, speed_y = -speed_x, -speed_y
+
+    left_y = left.y + left_move
+    if left_y < 0:
+        left_y = 0
+    elif left_y > HEIGHT - PADDLE_HEIGHT:
+        left_y = HEIGHT - PADDLE_HEIGHT
+    right_y = right.y + right_move
+    if right_y < 0:
+        right_y = 0
+    elif right_y > HEIGHT - PADDLE_HEIGHT:
+        right_y = HEIGHT - PADDLE_HEIGHT
+    return x, y, speed_x, speed_y, left_y, right_y, goal
+
+# CPU paddle skill: frames it waits before reacting to a shot, and how far off
+# (at most, in pixels) its read of where the ball will arrive can be
+DIFFICULTIES = {
+    "easy": (24, 90),
+    "normal": (12, 45),
+    "hard": (4, 15),
+    "perfect": (0, 0),
+}
+
+def predict_intercept(x, y, speed_x, speed_y, face_x, size=None):
+    # Top of the ball when its top-left corner reaches face_x, bouncing off the
+    # top and bottom walls: unfold the bounces into a straight line, then fold
+    # the end point back into the field. Paddles are ignored
+    size = ball.width if size is None else size
+    span = HEIGHT - size
+    time = (face_x - x) / speed_x
+    y = (y + speed_y * time) % (2 * span)
+    return y if y <= span else 2 * span - y
+
+class PaddleAI:
+    # Moves a paddle to where the ball will cross its face. The prediction is
+    # made once per shot, when the ball turns towards the paddle (after the
+    # other paddle hits it, or a restart); in between the paddle just heads for
+    # the predicted spot, or back to the middle while the ball moves away
+    def __init__(self, paddle, difficulty="normal", speed=7, rng=random):
+        self.paddle = paddle
+        self.reaction_frames, self.error = DIFFICULTIES[difficulty]
+        self.speed = speed
+        self.rng = rng
+        self.left_side = paddle.centerx < WIDTH / 2
+        self.incoming = False
+        self.target_y = paddle.centery
+        self.wait = 0
+
+    def update(self, x, y, speed_x, speed_y, size=None):
+        size = ball.width if size is None else size
+        incoming = speed_x < 0 if self.left_side else speed_x > 0
+        if incoming != self.incoming:
+            self.incoming = incoming
+            self.wait = self.reaction_frames
+            if incoming:
+                face_x = self.paddle.right if self.left_side else self.paddle.left - size
+                ball_top = predict_intercept(x, y, speed_x, speed_y, face_x, size)
+                self.target_y = ball_top + size / 2 + self.rng.uniform(-self.error, self.error)
+            else:
+                self.target_y = HEIGHT / 2
+
+        if self.wait > 0:
+            self.wait -= 1
+            return
+        offset = self.target_y - self.paddle.centery
+        self.paddle.y += max(-self.speed, min(self.speed, round(offset)))
+        if self.paddle.top <= 0:
+            self.paddle.top = 0
+        if self.paddle.bottom >= HEIGHT:
+            self.paddle.bottom = HEIGHT
+
+def ai_match(left_difficulty="normal", right_difficulty="normal", points=11, seed=None, max_frames=1000000):
+    # Headless AI-vs-AI game to points; returns (left score, right score, frames)
+    rng = random.Random(seed)
+    left = pygame.Rect(10, HEIGHT // 2 - PADDLE_HEIGHT // 2, PADDLE_WIDTH, PADDLE_HEIGHT)
+    right = pygame.Rect(WIDTH - 20, HEIGHT // 2 - PADDLE_HEIGHT // 2, PADDLE_WIDTH, PADDLE_HEIGHT)
+    left_ai = PaddleAI(left, left_difficulty, rng=rng)
+    right_ai = PaddleAI(right, right_difficulty, rng=rng)
+
+    size = ball.width
+    x, y = WIDTH / 2 - size / 2, HEIGHT / 2 - size / 2
+    speed_x, speed_y = rng.choice((-7, 7)), rng.choice((-7, 7))
+    left_score = right_score = 0
+    frames = 0
+    while max(left_score, right_score) < points and frames < max_frames:
+        frames += 1
+        # Both paddles are moved by their AIs, not by play_tick
+        x, y, speed_x, speed_y, _, _, goal = play_tick(x, y, speed_x, speed_y, left, right, size=size)
+        if goal == "left":
+            right_score += 1
+        elif goal == "right":
+            left_score += 1
+        left_ai.update(x, y, speed_x, speed_y, size)
+        right_ai.update(x, y, speed_x, speed_y, size)
+    return left_score, right_score, frames
+
+def init_display():
+    global screen, font
+    screen = open_window((WIDTH, HEIGHT), "Pong")
+    font = pygame.font.Font(None, 74)
+    return screen
+
+def draw_field(right, left, ball_rect, right_score, left_score):
+    screen.fill(BLACK)
+    pygame.draw.rect(screen, WHITE, right)
+    pygame.draw.rect(screen, WHITE, left)
+    if ball_rect is not None:
+        pygame.draw.ellipse(screen, WHITE, ball_rect)
+    pygame.draw.aaline(screen, WHITE, (WIDTH / 2, 0), (WIDTH / 2, HEIGHT))
+
+    right_text = font.render(f"{right_score}", True, WHITE)
+    screen.blit(right_text, (WIDTH / 2 + 20, 10))
+
+    left_text = font.render(f"{left_score}", True, WHITE)
+    screen.blit(left_text, (WIDTH / 2 - 45, 10))
+
+def handle_event(event):
+    global player1_speed
+    if event.type == pygame.KEYDOWN:
+        if event.key == pygame.K_DOWN:
+            player1_speed += PADDLE_SPEED
+        if event.key == pygame.K_UP:
+            player1_speed -= PADDLE_SPEED
+    if event.type == pygame.KEYUP:
+        if event.key == pygame.K_DOWN:
+            player1_speed -= PADDLE_SPEED
+        if event.key == pygame.K_UP:
+            player1_speed += PADDLE_SPEED
+
+def update(cpu):
+    global ball_x, ball_y, ball_speed_x, ball_speed_y, player1_score, player2_score
+
+    # Ball movement, with bounces resolved at their time of impact so a
+    # fast ball can't tunnel through a paddle, then player movement. The CPU
+    # paddle moves itself afterwards
+    ball_x, ball_y, ball_speed_x, ball_speed_y, player2.y, player1.y, goal = play_tick(
+        ball_x, ball_y, ball_speed_x, ball_speed_y, player2, player1, 0, player1_speed
+    )
+    ball.topleft = (round(ball_x), round(ball_y))
+
+    if goal == "left":
+        player1_score += 1
+    if goal == "right":
+        player2_score += 1
+
+    cpu.update(ball_x, ball_y, ball_speed_x, ball_speed_y)
+
+def render(alpha):
+    draw_field(player1, player2, ball, player1_score, player2_score)
+    pygame.display.flip()
+
+def main(difficulty="normal"):
+    init_display()
+    cpu = PaddleAI(player2, difficulty, player2_speed)
+    GameLoop(TICK_RATE).run(lambda: update(cpu), render, handle_event)
+    pygame.quit()
+    sys.exit()
 
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser(description="Pong against the computer")
+    parser.add_argument("difficulty", nargs="?", default="normal", choices=DIFFICULTIES,
+                        help="how well the CPU paddle plays (default: normal)")
+    main(parser.parse_args().difficulty)
@@ -0,0 +1,206 @@
+
+import sys
+
+import numpy as np
+import pygame
+
+from pong import (
+    HEIGHT,
+    MAX_BOUNCES,
+    TICK_RATE,
+    WHITE,
+    WIDTH,
+    ball,
+    draw_field,
+    init_display,
+    player1,
+    player2,
+    player2_speed,
+)
+from runtime import GameLoop
+
+BALL_SPEED = 7
+
+# Event codes for the first thing each ball hits within a step
+NOTHING = 0
+WALL = 1
+PADDLE_FACE = 2
+PADDLE_EDGE = 3
+LEFT_GOAL = 4
+RIGHT_GOAL = 5
+
+
+def crossing_times(position, speed, low, high):
+    # Time each ball's position reaches low (moving down) or high (moving up)
+    # and inf if it isn't moving; the same wall/goal test as pong.move_ball
+    with np.errstate(divide="ignore", invalid="ignore"):
+        times = np.where(speed < 0, (low - position) / speed, (high - position) / speed)
+    times[speed == 0] = np.inf
+    return times
+
+
+def paddle_impacts(x, y, speed_x, speed_y, size, paddle):
+    # pong.paddle_impact for every ball at once: (time of impact, inf for no
+    # hit, and whether the ball hits the paddle's face rather than an edge)
+    left, right = paddle.left - size, paddle.right
+    top, bottom = paddle.top - size, paddle.bottom
+    with np.errstate(divide="ignore", invalid="ignore"):
+        entry_x = (np.where(speed_x > 0, left, right) - x) / speed_x
+        exit_x = (np.where(speed_x > 0, right, left) - x) / speed_x
+        entry_y = (np.where(speed_y > 0, top, bottom) - y) / speed_y
+        exit_y = (np.where(speed_y > 0, bottom, top) - y) / speed_y
+
+    # Not moving along an axis: always overlapping on it, or never
+    still_x = speed_x == 0
+    entry_x[still_x] = np.where((left < x[still_x]) & (x[still_x] < right), -np.inf, np.inf)
+    exit_x[still_x] = np.inf
+    still_y = speed_y == 0
+    entry_y[still_y] = np.where((top < y[still_y]) & (y[still_y] < bottom), -np.inf, np.inf)
+    exit_y[still_y] = np.inf
+
+    entry = np.maximum(entry_x, entry_y)
+    hit = (entry >= 0) & (entry < np.minimum(exit_x, exit_y))
+    return np.where(hit, entry, np.inf), entry_x >= entry_y
+
+
+# Any number of balls as rows in NumPy arrays. Each step sweeps all of them
+# against the walls, goals and paddles at once; only the balls that bounced go
+# round again for the rest of the step, the way pong.move_ball loops
+class BallSwarm:
+    def __init__(self, count, seed=None, size=None):
+        self.count = count
+        self.size = ball.width if size is None else size
+        self.rng = np.random.default_rng(seed)
+        self.x = np.empty(count)
+        self.y = np.empty(count)
+        self.speed_x = np.empty(count)
+        self.speed_y = np.empty(count)
+        self.respawn(np.arange(count))
+
+    def respawn(self, balls):
+        # Back to the middle, heading off at a random angle
+        self.x[balls] = WIDTH / 2 - self.size / 2
+        self.y[balls] = HEIGHT / 2 - self.size / 2
+        self.speed_x[balls] = self.rng.choice((-BALL_SPEED, BALL_SPEED), balls.size)
+        self.speed_y[balls] = self.rng.uniform(-BALL_SPEED, BALL_SPEED, balls.size)
+
+    def step(self, paddles, dt=1.0):
+        # Advance every ball by dt steps; returns (goals on the left edge,
+        # goals on the right edge). Scoring balls respawn in the middle
+        size = self.size
+        active = np.arange(self.count)
+        remaining = np.full(self.count, float(dt))
+        left_goals = right_goals = 0
+
+        for _ in range(MAX_BOUNCES):
+            if active.size == 0:
+                break
+            x, y = self.x[active], self.y[active]
+            speed_x, speed_y = self.speed_x[active], self.speed_y[active]
+
+            # Earliest event per ball
+            time = crossing_times(y, speed_y, 0, HEIGHT - size)
+            event = np.where(np.isfinite(time), WALL, NOTHING)
+            goal_time = crossing_times(x, speed_x, 0, WIDTH - size)
+            earlier = goal_time < time
+            time = np.where(earlier, goal_time, time)
+            event = np.where(earlier, np.where(speed_x < 0, LEFT_GOAL, RIGHT_GOAL), event)
+            for paddle in paddles:
+                impact, face = paddle_impacts(x, y, speed_x, speed_y, size, paddle)
+                earlier = impact < time
+                time = np.where(earlier, impact, time)
+                event = np.where(earlier, np.where(face, PADDLE_FACE, PADDLE_EDGE), event)
+
+            # Balls with nothing in the way for the rest of the step are done
+            time_left = remaining[active]
+            hit = time <= time_left
+            time = np.where(hit, time, time_left)
+            self.x[active] = x + speed_x * time
+            self.y[active] = y + speed_y * time
+            remaining[active] = time_left - time
+
+            flip_x = hit & (event == PADDLE_FACE)
+            flip_y = hit & ((event == WALL) | (event == PADDLE_EDGE))
+            self.speed_x[active[flip_x]] *= -1
+            self.speed_y[active[flip_y]] *= -1
+
+            scored_left = active[hit & (event == LEFT_GOAL)]
+            scored_right = active[hit & (event == RIGHT_GOAL)]
+            left_goals += scored_left.size
+            right_goals += scored_right.size
+            self.respawn(scored_left)
+            self.respawn(scored_right)
+
+            active = active[flip_x | flip_y]
+
+        return left_goals, right_goals
+
+    def draw(self, surface, sprite):
+        xs = np.rint(self.x).astype(int).tolist()
+        ys = np.rint(self.y).astype(int).tolist()
+        surface.blits([(sprite, position) for position in zip(xs, ys)], doreturn=False)
+
+
+def ball_sprite(size):
+    sprite = pygame.Surface((size, size))
+    sprite.set_colorkey((0, 0, 0))
+    pygame.draw.ellipse(sprite, WHITE, sprite.get_rect())
+    return sprite.convert()
+
+
+def main(count=300):
+    # Chaos round: you (right paddle) and the CPU against count balls at once
+    screen = init_display()
+    swarm = BallSwarm(count)
+    sprite = ball_sprite(swarm.size)
+    loop = GameLoop(TICK_RATE)
+    clock = pygame.time.Clock() # Only measures the frame rate shown
+    font = pygame.font.Font(None, 30)
+    player1_speed = 0
+    player1_score = player2_score = 0
+
+    def handle_event(event):
+        nonlocal player1_speed
+        if event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_DOWN:
+                player1_speed += 7
+            if event.key == pygame.K_UP:
+                player1_speed -= 7
+        if event.type == pygame.KEYUP:
+            if event.key == pygame.K_DOWN:
+                player1_speed -= 7
+            if event.key == pygame.K_UP:
+                player1_speed += 7
+
+    def update():
+        nonlocal player1_score, player2_score
+        left_goals, right_goals = swarm.step((player1, player2))
+        player1_score += left_goals
+        player2_score += right_goals
+
+        player1.y += player1_speed
+        player1.clamp_ip(screen.get_rect())
+
+        # The CPU goes for the incoming ball closest to its goal
+        incoming = swarm.speed_x < 0
+        if incoming.any():
+            nearest = np.flatnonzero(incoming)[np.argmin(swarm.x[incoming])]
+            offset = swarm.y[nearest] + swarm.size / 2 - player2.centery
+            player2.y += int(max(-player2_speed, min(player2_speed, offset)))
+            player2.clamp_ip(screen.get_rect())
+
+    def render(alpha):
+        clock.tick()
+        draw_field(player1, player2, None, player1_score, player2_score)
+        swarm.draw(screen, sprite)
+        fps_text = font.render(f"{count} balls, {clock.get_fps():.0f} FPS", True, WHITE)
+        screen.blit(fps_text, (10, HEIGHT - 30))
+        pygame.display.flip()
+
+    loop.run(update, render, handle_event)
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    # Usage: python pong_chaos.py [ball count]
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 300)
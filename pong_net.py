@@ -0,0 +1,227 @@
+
+import argparse
+import heapq
+import random
+import socket
+import struct
+import time
+from collections import namedtuple
+
+import pygame
+
+from pong import PADDLE_HEIGHT, PADDLE_SPEED, TICK_RATE, ball, draw_field, init_display, play_tick, player1, player2
+from runtime import GameLoop
+
+# Both instances run the same fixed-tick simulation from the same start, fed
+# the same inputs, so they only need to exchange inputs. Each side applies its
+# own input at once and guesses the other's (the last one it received); when
+# the real input turns out different, it rolls back to the snapshot taken
+# before that tick and simulates forward again
+MAX_ROLLBACK = 45 # Ticks we may run ahead of the other side's last known input
+# Every packet carries all our inputs the other side hasn't confirmed. That is
+# at most about 2 * MAX_ROLLBACK ticks (we run ahead of its inputs, which run
+# ahead of its acks) plus the round trip; past this we wait too
+MAX_INPUTS_PER_PACKET = 160
+
+# Everything the simulation needs; tuples are cheap to snapshot every tick
+PongState = namedtuple(
+    "PongState", "tick ball_x ball_y speed_x speed_y left_y right_y left_score right_score"
+)
+
+# Packet: the highest tick of the other side's inputs we have without gaps
+# (-1 for none), then a run of our inputs from a given tick, one signed byte each
+HEADER = struct.Struct("!iiB")
+
+def initial_state():
+    return PongState(0, float(ball.x), float(ball.y), 7, 7, player2.y, player1.y, 0, 0)
+
+def simulate(state, left_input, right_input):
+    # One pong.play_tick, with each paddle's input -1 up, 1 down or 0 stay
+    left = pygame.Rect(player2.x, state.left_y, player2.width, PADDLE_HEIGHT)
+    right = pygame.Rect(player1.x, state.right_y, player1.width, PADDLE_HEIGHT)
+    x, y, speed_x, speed_y, left_y, right_y, goal = play_tick(
+        state.ball_x, state.ball_y, state.speed_x, state.speed_y, left, right,
+        left_input * PADDLE_SPEED, right_input * PADDLE_SPEED,
+    )
+    left_score = state.left_score + (goal == "right")
+    right_score = state.right_score + (goal == "left")
+    return PongState(state.tick + 1, x, y, speed_x, speed_y, left_y, right_y, left_score, right_score)
+
+class LaggyLink:
+    # Test rig around a UDP socket: holds every outgoing packet back for the
+    # latency plus or minus the jitter (so packets also arrive out of order),
+    # and drops a fraction of them
+    def __init__(self, sock, latency=0.0, jitter=0.0, loss=0.0, rng=random):
+        self.sock = sock
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.rng = rng
+        self.queue = [] # (send time, sequence number, data, address)
+        self.sent = 0
+
+    def sendto(self, data, address):
+        if self.rng.random() < self.loss:
+            return
+        delay = max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter))
+        self.sent += 1
+        heapq.heappush(self.queue, (time.perf_counter() + delay, self.sent, data, address))
+        self.flush()
+
+    def flush(self):
+        now = time.perf_counter()
+        while self.queue and self.queue[0][0] <= now:
+            _, _, data, address = heapq.heappop(self.queue)
+            self.sock.sendto(data, address)
+
+class NetSession:
+    # One side of a networked match. side is "left" or "right"; sock is a bound
+    # non-blocking UDP socket; link is what packets are sent through (the socket
+    # itself, or a LaggyLink around it)
+    def __init__(self, side, sock, peer, link=None):
+        self.side = side
+        self.sock = sock
+        self.peer = peer
+        self.link = link or sock
+
+        self.state = initial_state()
+        self.snapshots = {0: self.state} # State at the start of each tick
+        self.local_inputs = {}
+        self.remote_inputs = {} # Confirmed inputs from the other side
+        self.used_remote = {} # Remote input each simulated tick was run with
+        self.remote_confirmed = -1 # Every remote input up to here has arrived
+        self.peer_confirmed = -1 # Every input of ours up to here has arrived there
+        self.rollback_tick = None # Earliest tick simulated with a wrong guess
+        self.rollbacks = 0
+        self.resimulated_ticks = 0
+
+    def remote_input(self, tick):
+        # The real input if we have it, else a guess: the last one we know
+        if tick in self.remote_inputs:
+            return self.remote_inputs[tick]
+        return self.remote_inputs.get(self.remote_confirmed, 0)
+
+    def poll(self):
+        while True:
+            try:
+                data, _ = self.sock.recvfrom(HEADER.size + MAX_INPUTS_PER_PACKET)
+            except (BlockingIOError, ConnectionResetError):
+                break
+            ack, first_tick, count = HEADER.unpack_from(data)
+            self.peer_confirmed = max(self.peer_confirmed, ack)
+            inputs = struct.unpack_from(f"!{count}b", data, HEADER.size)
+            for tick, value in enumerate(inputs, first_tick):
+                if tick <= self.remote_confirmed or tick in self.remote_inputs:
+                    continue
+                self.remote_inputs[tick] = value
+                if tick in self.used_remote and self.used_remote[tick] != value:
+                    if self.rollback_tick is None or tick < self.rollback_tick:
+                        self.rollback_tick = tick
+            while self.remote_confirmed + 1 in self.remote_inputs:
+                self.remote_confirmed += 1
+
+        if self.rollback_tick is not None:
+            self.rollback()
+
+    def rollback(self):
+        # Restore the snapshot before the first mispredicted tick and replay
+        # every tick since with the inputs known now
+        current = self.state.tick
+        self.state = self.snapshots[self.rollback_tick]
+        self.rollback_tick = None
+        self.rollbacks += 1
+        while self.state.tick < current:
+            self.resimulated_ticks += 1
+            self.run_tick()
+
+    def run_tick(self):
+        tick = self.state.tick
+        local = self.local_inputs[tick]
+        remote = self.remote_input(tick)
+        self.used_remote[tick] = remote
+        if self.side == "left":
+            self.state = simulate(self.state, local, remote)
+        else:
+            self.state = simulate(self.state, remote, local)
+        self.snapshots[tick + 1] = self.state
+
+    def advance(self, local_input):
+        # Run one tick with our input; False (and nothing done) when we are so
+        # far ahead of the other side that we wait for it to catch up, or when
+        # our unconfirmed inputs would no longer fit in one packet
+        tick = self.state.tick
+        if tick - self.remote_confirmed > MAX_ROLLBACK or tick - self.peer_confirmed >= MAX_INPUTS_PER_PACKET:
+            self.send()
+            return False
+        self.local_inputs[tick] = local_input
+        self.run_tick()
+        self.send()
+        self.forget(min(self.remote_confirmed, self.peer_confirmed))
+        return True
+
+    def send(self):
+        # Every input the other side hasn't confirmed yet, so lost packets
+        # are covered by the next one however many are lost in a row
+        first_tick = self.peer_confirmed + 1
+        inputs = [self.local_inputs[tick] for tick in range(first_tick, self.state.tick)]
+        data = HEADER.pack(self.remote_confirmed, first_tick, len(inputs)) + struct.pack(f"!{len(inputs)}b", *inputs)
+        self.link.sendto(data, self.peer)
+
+    def forget(self, confirmed):
+        # Ticks confirmed by both sides can never be rolled back to again
+        for tick in list(self.used_remote):
+            if tick >= confirmed:
+                break
+            del self.used_remote[tick]
+            del self.snapshots[tick]
+            self.local_inputs.pop(tick, None)
+            self.remote_inputs.pop(tick, None)
+
+def open_socket(port):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", port))
+    sock.setblocking(False)
+    return sock
+
+def run(side, port, peer, latency=0.0, jitter=0.0, loss=0.0):
+    # Play one side in a window: UP/DOWN move your paddle
+    init_display()
+    pygame.display.set_caption(f"Pong ({side})")
+    sock = open_socket(port)
+    session = NetSession(side, sock, peer, LaggyLink(sock, latency, jitter, loss))
+
+    def update():
+        session.link.flush()
+        session.poll()
+        keys = pygame.key.get_pressed()
+        # When too far ahead this tick is skipped and the other side catches up
+        session.advance(keys[pygame.K_DOWN] - keys[pygame.K_UP])
+
+    def render(alpha):
+        state = session.state
+        draw_field(
+            pygame.Rect(player1.x, state.right_y, player1.width, PADDLE_HEIGHT),
+            pygame.Rect(player2.x, state.left_y, player2.width, PADDLE_HEIGHT),
+            pygame.Rect(round(state.ball_x), round(state.ball_y), ball.width, ball.height),
+            state.right_score,
+            state.left_score,
+        )
+        pygame.display.flip()
+
+    GameLoop(TICK_RATE).run(update, render)
+    pygame.quit()
+
+if __name__ == "__main__":
+    # Two instances on one machine, e.g.
+    #   python pong_net.py left 5000 5001 --latency 100 --jitter 30
+    #   python pong_net.py right 5001 5000 --latency 100 --jitter 30
+    parser = argparse.ArgumentParser(description="Two-player Pong over UDP")
+    parser.add_argument("side", choices=("left", "right"))
+    parser.add_argument("port", type=int, help="local UDP port")
+    parser.add_argument("peer_port", type=int, help="the other instance's UDP port")
+    parser.add_argument("--peer-host", default="127.0.0.1")
+    parser.add_argument("--latency", type=float, default=0, help="added one-way delay in ms")
+    parser.add_argument("--jitter", type=float, default=0, help="random +/- delay in ms")
+    parser.add_argument("--loss", type=float, default=0, help="fraction of packets dropped")
+    args = parser.parse_args()
+    run(args.side, args.port, (args.peer_host, args.peer_port), args.latency / 1000, args.jitter / 1000, args.loss)
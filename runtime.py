@@ -0,0 +1,120 @@
+
+import time
+
+import pygame
+
+# Longest stretch of real time a single frame may catch up on. After a stall
+# (a window drag, a breakpoint, a slow frame) the rest is dropped instead of
+# running a burst of ticks that makes the next frame slow too (the spiral of death)
+MAX_FRAME_TIME = 0.25
+
+
+# The frame loop every game runs on. Logic advances in fixed ticks of
+# 1 / update_rate seconds however fast frames come; frames are drawn at up to
+# render_rate per second, and render gets how far real time is between the
+# last tick and the next (0 to 1) so it can draw moving things in between.
+# While the window is hidden or minimized frames drop to idle_rate, and a game
+# waiting for a key (a game over screen) can block on wait() instead
+class GameLoop:
+    def __init__(self, update_rate, render_rate=60, idle_rate=10, uncapped=False):
+        self.update_rate = update_rate
+        self.tick_time = 1 / update_rate
+        self.render_rate = render_rate
+        self.idle_rate = idle_rate
+        # Uncapped loops tick back to back without pacing, for headless runs
+        self.uncapped = uncapped
+
+        self.running = False
+        self.waiting = False
+        self.wait_timeout = 0
+        self.ticks = 0
+        self.frames = 0
+
+    def stop(self):
+        self.running = False
+
+    def wait(self, timeout=0):
+        # After this frame, sleep until an event arrives (or timeout ms pass,
+        # which hands handle_event a NOEVENT) instead of ticking; resume() ends it
+        self.waiting = True
+        self.wait_timeout = timeout
+
+    def resume(self):
+        self.waiting = False
+
+    def run(self, update, render=None, handle_event=None, max_ticks=None):
+        # update() runs one tick, render(alpha) draws a frame and
+        # handle_event(event) gets every pygame event; any of them may call
+        # stop(). Returns once stopped, or after max_ticks ticks
+        self.running = True
+        if self.uncapped:
+            self.run_uncapped(update, render, handle_event, max_ticks)
+            return
+
+        clock = pygame.time.Clock()
+        previous = time.perf_counter()
+        accumulator = 0.0
+        while self.running:
+            if self.waiting:
+                event = pygame.event.wait(self.wait_timeout) if self.wait_timeout else pygame.event.wait()
+                if handle_event:
+                    handle_event(event)
+                if event.type == pygame.QUIT:
+                    self.stop()
+                # Time spent waiting doesn't count towards the next tick
+                previous = time.perf_counter()
+                accumulator = 0.0
+                continue
+
+            now = time.perf_counter()
+            accumulator += min(now - previous, MAX_FRAME_TIME)
+            previous = now
+
+            for event in pygame.event.get():
+                if handle_event:
+                    handle_event(event)
+                if event.type == pygame.QUIT:
+                    self.stop()
+
+            while accumulator >= self.tick_time and self.running and not self.waiting:
+                update()
+                self.ticks += 1
+                accumulator -= self.tick_time
+                if max_ticks is not None and self.ticks >= max_ticks:
+                    self.stop()
+
+            if render and self.running:
+                render(min(accumulator / self.tick_time, 1.0))
+                self.frames += 1
+
+            clock.tick(self.render_rate if pygame.display.get_active() else self.idle_rate)
+
+    def run_uncapped(self, update, render, handle_event, max_ticks):
+        # One tick and one frame after another, as fast as they go. Without a
+        # window (pacman.simulate) there are no events to read
+        while self.running and (max_ticks is None or self.ticks < max_ticks):
+            if pygame.display.get_init():
+                for event in pygame.event.get():
+                    if handle_event:
+                        handle_event(event)
+                    if event.type == pygame.QUIT:
+                        self.stop()
+                if not self.running:
+                    break
+            update()
+            self.ticks += 1
+            if render:
+                render(1.0)
+                self.frames += 1
+        self.stop()
+
+
+def open_window(size, caption):
+    # Start only the pygame modules the games use (display and font; audio and
+    # joysticks are slow to bring up and never used) and open the window.
+    # Games call this when they start rather than at import
+    pygame.display.init()
+    pygame.font.init()
+    screen = pygame.display.set_mode(size)
+    pygame.display.set_caption(caption)
+    return screen
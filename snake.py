@@ -1,14 +1,16 @@
 import pygame
 import random
+import sys
+import heapq
+from collections import deque
+from itertools import islice
 
-# Initialize Pygame
-pygame.init()
+from runtime import GameLoop, open_window
 
 # Screen dimensions
 screen_width = 600
 screen_height = 400
-screen = pygame.display.set_mode((screen_width, screen_height))
-pygame.display.set_caption('Snake')
+screen = None # Opened by init_display
 
 # Colors
 white = (255, 255, 255)
@@ -18,22 +20,37 @@ green = (0, 255, 0)
 
 # Snake properties
 snake_block = 20
-snake_speed = 10
+snake_speed = 10 # Logic ticks per second
 
-# Font
-font_style = pygame.font.SysFont(None, 50)
-score_font = pygame.font.SysFont("comicsansms", 35)
+# Rendering and input run faster than the logic, drawing the snake partway
+# between ticks; at most this many turns wait for upcoming ticks
+render_fps = 60
+turn_queue_size = 3
+
+# Fonts, loaded by init_display. Both use pygame's bundled font: looking up a
+# system font scans every font installed, which is slow to start
+font_style = None
+score_font = None
+
+def init_display():
+    global screen, font_style, score_font
+    screen = open_window((screen_width, screen_height), 'Snake')
+    font_style = pygame.font.Font(None, 50)
+    score_font = pygame.font.Font(None, 35)
 
 def show_score(score):
     value = score_font.render("Your Score: " + str(score), True, white)
     screen.blit(value, [0, 0])
 
-def draw_snake(snake_block, snake_list):
-    for segment in snake_list:
+def draw_snake(snake_block, snake_list, head=None):
+    # head, if given, is where the last segment is drawn instead of its cell
+    for segment in islice(snake_list, max(len(snake_list) - 1, 0)):
         pygame.draw.rect(screen, white, [segment[0], segment[1], snake_block, snake_block])
     # Draw eyes on the head
     if len(snake_list) > 0:
-        head = snake_list[-1]
+        if head is None:
+            head = snake_list[-1]
+        pygame.draw.rect(screen, white, [head[0], head[1], snake_block, snake_block])
         eye_size = snake_block // 5
         eye_offset = snake_block // 4
         # A simple representation of eyes
@@ -45,89 +62,462 @@ def message(msg, color):
     text_rect = mesg.get_rect(center=(screen_width / 2, screen_height / 2))
     screen.blit(mesg, text_rect)
 
-def gameLoop():
-    game_over = False
-    game_close = False
+class FreeCells:
+    # Board cells not covered by the snake. The cells live in a list with each
+    # cell's position in a dict, so add, remove (swap with the last cell) and
+    # uniform sampling are all O(1), however full the board gets
+    def __init__(self, width, height, block, rng=random):
+        self.rng = rng
+        self.width = width
+        self.height = height
+        self.cells = [(x, y) for y in range(0, height, block) for x in range(0, width, block)]
+        self.positions = {cell: i for i, cell in enumerate(self.cells)}
+
+    def add(self, cell):
+        x, y = cell
+        if cell not in self.positions and 0 <= x < self.width and 0 <= y < self.height:
+            self.positions[cell] = len(self.cells)
+            self.cells.append(cell)
+
+    def remove(self, cell):
+        i = self.positions.pop(cell, None)
+        if i is None:
+            return
+        last = self.cells.pop()
+        if i < len(self.cells):
+            self.cells[i] = last
+            self.positions[last] = i
+
+    def sample(self):
+        return self.rng.choice(self.cells) if self.cells else None
+
+class SnakeGame:
+    # State of one round. reset() starts a new round reusing the same
+    # containers; step() advances the game by one tick. rng places the food
+    def __init__(self, width, height, block, rng=random):
+        self.width = width
+        self.height = height
+        self.block = block
+
+        # Body segments as (x, y) tuples from tail to head, plus the set of cells
+        # they occupy so self-collision is a single lookup
+        self.snake_List = deque()
+        self.snake_cells = set()
+        # Food is always placed on a cell the snake doesn't cover
+        self.free_cells = FreeCells(width, height, block, rng)
+        # Turns pressed between ticks; each tick applies at most one
+        self.turns = deque(maxlen=turn_queue_size)
+        self.reset()
+
+    def reset(self):
+        # Hand the old body back to the free cell index and empty the containers
+        for cell in self.snake_List:
+            self.free_cells.add(cell)
+        self.snake_List.clear()
+        self.snake_cells.clear()
+        self.turns.clear()
+        self.game_close = False
+
+        # Snake initial position: the middle cell, so the head stays on the
+        # same grid as the food whatever the board size
+        self.x1 = (self.width // self.block // 2) * self.block
+        self.y1 = (self.height // self.block // 2) * self.block
+
+        self.x1_change = 0
+        self.y1_change = 0
+        self.Length_of_snake = 1
+
+        # Where the head and the dropped tail were before the last tick, for
+        # drawing in between ticks
+        self.previous_head = (self.x1, self.y1)
+        self.previous_tail = None
+
+        # The head's cell is the whole body until the first tick moves it
+        self.snake_List.append((self.x1, self.y1))
+        self.snake_cells.add((self.x1, self.y1))
+        self.free_cells.remove((self.x1, self.y1))
+        self.foodx, self.foody = self.free_cells.sample()
+
+    def turn(self, x1_change, y1_change):
+        # Queue a turn, skipping repeats of the direction the snake will
+        # already be heading in; when the queue is full the oldest turn is lost
+        last = self.turns[-1] if self.turns else (self.x1_change, self.y1_change)
+        if (x1_change, y1_change) != last:
+            self.turns.append((x1_change, y1_change))
+
+    def step(self):
+        if self.turns:
+            self.x1_change, self.y1_change = self.turns.popleft()
+        self.previous_head = (self.x1, self.y1)
+        self.previous_tail = None
+
+        if self.x1 >= self.width or self.x1 < 0 or self.y1 >= self.height or self.y1 < 0:
+            self.game_close = True
+        self.x1 += self.x1_change
+        self.y1 += self.y1_change
+        snake_Head = (self.x1, self.y1)
+        # The tail moves out of the way before the head moves in
+        if len(self.snake_List) >= self.Length_of_snake:
+            tail = self.snake_List.popleft()
+            self.snake_cells.discard(tail)
+            self.free_cells.add(tail)
+            self.previous_tail = tail
+
+        if snake_Head in self.snake_cells:
+            self.game_close = True
+
+        self.snake_List.append(snake_Head)
+        self.snake_cells.add(snake_Head)
+        self.free_cells.remove(snake_Head)
+
+        if self.x1 == self.foodx and self.y1 == self.foody:
+            food = self.free_cells.sample()
+            if food is None:
+                # The snake fills the whole board
+                self.game_close = True
+            else:
+                self.foodx, self.foody = food
+            self.Length_of_snake += 1
+
+def hamiltonian_cycle(cols, rows):
+    # Cells of the board in the order of a closed tour through all of them:
+    # a serpentine over columns 1.. with column 0 as the way back. Needs an even
+    # number of rows (or columns, by transposing); None when both are odd
+    if rows % 2 == 0 and cols >= 2:
+        cycle = [(x, 0) for x in range(cols)]
+        for y in range(1, rows):
+            columns = range(cols - 1, 0, -1) if y % 2 == 1 else range(1, cols)
+            cycle.extend((x, y) for x in columns)
+        cycle.extend((0, y) for y in range(rows - 1, 0, -1))
+        return cycle
+    if cols % 2 == 0 and rows >= 2:
+        return [(x, y) for y, x in hamiltonian_cycle(rows, cols)]
+    return None
+
+def spare_cell_cycle(cols, rows):
+    # For boards with an odd number of both columns and rows (at least 3 of
+    # each), which have no Hamiltonian cycle: (cycle, spare cell), a closed tour
+    # of every cell but the bottom left corner. The cycle of all rows but the
+    # bottom one picks up the bottom row in pairs on its way back along the row
+    # above, ending with (1, bottom) -> (1, bottom - 1) -> (0, bottom - 1): the
+    # spare can swap places with the middle one of those (see Autopilot.swap)
+    if cols % 2 == 0 or rows % 2 == 0 or cols < 3 or rows < 3:
+        return None, None
+    bottom = rows - 1
+    cycle = []
+    for x, y in hamiltonian_cycle(cols, rows - 1):
+        cycle.append((x, y))
+        if y == bottom - 1 and x % 2 == 0 and x >= 2:
+            cycle.extend([(x, bottom), (x - 1, bottom)])
+    return cycle, (0, bottom)
+
+class Autopilot:
+    # Plays the game on the board's grid of cells, heading for the food along
+    # A* paths. When the board has a Hamiltonian cycle, paths only ever move the
+    # head forwards along the cycle without passing the tail, which keeps the
+    # body in cycle order: following the cycle is then always a safe fallback,
+    # and the only one used once the snake fills tight_ratio of the board.
+    # On boards with an odd number of both columns and rows the cycle leaves out
+    # one spare cell, swapped into the cycle whenever the food lands on it. The
+    # last food there always lands on the spare with the head out of reach, so
+    # those rounds end one cell short of a full board.
+    # Without a cycle a path is only taken if the tail stays reachable after it.
+    # A path stays valid while the snake follows it (the body only moves out of
+    # its way), so it is replanned only when the food moves or the snake leaves it
+    def __init__(self, game, tight_ratio=0.5):
+        self.game = game
+        self.cols = game.width // game.block
+        self.rows = game.height // game.block
+        self.tight_length = int(self.cols * self.rows * tight_ratio)
+
+        self.cycle = hamiltonian_cycle(self.cols, self.rows)
+        self.spare = None # The one cell off the cycle, on odd by odd boards
+        if self.cycle is None:
+            self.cycle, self.spare = spare_cell_cycle(self.cols, self.rows)
+        self.cycle_order = {cell: i for i, cell in enumerate(self.cycle)} if self.cycle else {}
+        if self.spare:
+            # Position of the cycle cell the spare can take the place of
+            self.swap_index = self.cycle.index((1, self.rows - 2))
 
-    # Snake initial position
-    x1 = screen_width / 2
-    y1 = screen_height / 2
+        self.path = deque()
+        self.path_food = None
+        self.expected_head = None
+        self.retry_tick = 0 # No replanning before this tick after a failed plan
+        self.tick = 0
 
-    x1_change = 0
-    y1_change = 0
+    def cell(self, x, y):
+        return (int(x // self.game.block), int(y // self.game.block))
 
-    snake_List = []
-    Length_of_snake = 1
+    def neighbours(self, cell):
+        x, y = cell
+        for nx, ny in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+            if 0 <= nx < self.cols and 0 <= ny < self.rows:
+                yield (nx, ny)
 
-    # Food position
-    foodx = round(random.randrange(0, screen_width - snake_block) / float(snake_block)) * float(snake_block)
-    foody = round(random.randrange(0, screen_height - snake_block) / float(snake_block)) * float(snake_block)
+    def blocked(self, cell, tail):
+        # Body cells block, except the tail when it moves away this tick
+        game = self.game
+        if cell == tail and len(game.snake_List) >= game.Length_of_snake:
+            return False
+        return (cell[0] * game.block, cell[1] * game.block) in game.snake_cells
 
-    clock = pygame.time.Clock()
+    def tight(self):
+        # Past tight_length a board with a cycle is only followed round the cycle
+        return self.cycle is not None and self.game.Length_of_snake >= self.tight_length
 
-    while not game_over:
+    def ahead(self, origin, cell):
+        # How far cell is along the cycle from origin
+        return (self.cycle_order[cell] - self.cycle_order[origin]) % len(self.cycle)
 
-        while game_close == True:
-            screen.fill(white)
-            message("Game Over! Q-Quit, C-Play", red)
-            show_score(Length_of_snake - 1)
-            pygame.display.update()
+    def next_move(self):
+        # (x1_change, y1_change) for the next tick, or None to keep going
+        game = self.game
+        self.tick += 1
+        head = self.cell(game.x1, game.y1)
+        food = self.cell(game.foodx, game.foody)
+        tail = self.cell(*game.snake_List[0]) if game.snake_List else head
 
-            for event in pygame.event.get():
-                if event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_q:
-                        game_over = True
-                        game_close = False
-                    if event.key == pygame.K_c:
-                        gameLoop()
+        if self.cycle and head not in self.cycle_order:
+            # Switched on with the head on the spare cell
+            return self.turn_to(head, self.greedy_move(head, food, tail))
+        if food == self.spare:
+            swapped = self.cycle[self.swap_index]
+            if swapped == tail and self.cycle[self.swap_index - 1] == head and \
+                    len(game.snake_List) >= game.Length_of_snake:
+                # The body covers the whole cycle: the tail leaves the swapped
+                # cell as the head moves onto the spare instead (which ends the
+                # round, as the cell it frees can't be reached in time)
+                self.swap()
+                return self.turn_to(head, food)
+            if swapped != head and not self.blocked(swapped, None):
+                self.swap()
 
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                game_over = True
+        following = self.path and head == self.expected_head and food == self.path_food
+        if not following:
+            self.path.clear()
+            if not self.tight() and self.tick >= self.retry_tick:
+                self.path = self.plan(head, food, tail)
+                self.path_food = food
+                if not self.path:
+                    self.retry_tick = self.tick + max(self.cols, self.rows)
+
+        if self.path:
+            target = self.path.popleft()
+        else:
+            target = self.fallback(head, food, tail)
+        return self.turn_to(head, target)
+
+    def turn_to(self, head, target):
+        if target is None:
+            return None
+        self.expected_head = target
+        return ((target[0] - head[0]) * self.game.block, (target[1] - head[1]) * self.game.block)
+
+    def swap(self):
+        # Put the spare cell in the cycle in place of the free cell that shares
+        # its two neighbours along the cycle; that cell becomes the spare
+        swapped = self.cycle[self.swap_index]
+        self.cycle[self.swap_index] = self.spare
+        self.cycle_order[self.spare] = self.swap_index
+        del self.cycle_order[swapped]
+        self.spare = swapped
+        self.path.clear()
+
+    def plan(self, head, food, tail):
+        if self.cycle:
+            # Every cell strictly between the head and the tail along the cycle
+            # is free; keep a gap of two so the snake can grow after eating
+            room = self.ahead(head, tail) or len(self.cycle)
+            def allowed(cell, previous):
+                return cell in self.cycle_order and self.ahead(previous, cell) > 0 and \
+                    self.ahead(head, previous) < self.ahead(head, cell) < room - 1
+            path = self.find_path(head, food, allowed)
+            if path is None or not self.safe_cut(room, self.holes(head, tail), self.ahead(head, food), len(path)):
+                return deque()
+            return path
+
+        path = self.find_path(head, food, lambda cell, previous: not self.blocked(cell, tail))
+        if path is None or not self.tail_reachable_after(head, path):
+            return deque()
+        return path
+
+    def holes(self, head, tail):
+        # Free cells left inside the body's stretch of the cycle by shortcuts
+        return self.ahead(tail, head) + 1 - max(len(self.game.snake_List), 1)
+
+    def safe_cut(self, room, holes, distance, steps):
+        # Moving distance cells along the cycle in steps moves leaves the cells
+        # skipped as holes until the tail passes them. Only growing uses up the
+        # free cells ahead of the head, and running out of them with holes still
+        # left runs into the tail, so keep more free cells ahead than holes
+        return room - 2 - distance >= holes + distance - steps
+
+    def find_path(self, start, goal, allowed):
+        # A* over the grid; the path excludes start, None if goal is unreachable
+        def estimate(cell):
+            return abs(cell[0] - goal[0]) + abs(cell[1] - goal[1])
+
+        came_from = {start: None}
+        cost = {start: 0}
+        frontier = [(estimate(start), 0, start)]
+        while frontier:
+            _, steps, cell = heapq.heappop(frontier)
+            if cell == goal:
+                path = deque()
+                while cell != start:
+                    path.appendleft(cell)
+                    cell = came_from[cell]
+                return path
+            if steps > cost[cell]:
+                continue
+            for neighbour in self.neighbours(cell):
+                if neighbour not in cost or steps + 1 < cost[neighbour]:
+                    if not allowed(neighbour, cell):
+                        continue
+                    cost[neighbour] = steps + 1
+                    came_from[neighbour] = cell
+                    heapq.heappush(frontier, (steps + 1 + estimate(neighbour), steps + 1, neighbour))
+        return None
+
+    def tail_reachable_after(self, head, path, grows=True):
+        # Move a copy of the body along the path, grow it by the food at its
+        # end, and check that the new head can still get to the new tail
+        game = self.game
+        body = [self.cell(x, y) for x, y in game.snake_List]
+        if not body or body[-1] != head:
+            body.append(head)
+        body.extend(path)
+        body = body[-(game.Length_of_snake + grows):]
+        if len(body) < 3:
+            return True
+
+        new_head, new_tail = body[-1], body[0]
+        obstacles = set(body[1:-1])
+        seen = {new_head}
+        frontier = [new_head]
+        while frontier:
+            next_frontier = []
+            for cell in frontier:
+                for neighbour in self.neighbours(cell):
+                    if neighbour == new_tail:
+                        return True
+                    if neighbour not in seen and neighbour not in obstacles:
+                        seen.add(neighbour)
+                        next_frontier.append(neighbour)
+            frontier = next_frontier
+        return False
+
+    def fallback(self, head, food, tail):
+        if self.cycle:
+            # Follow the cycle, cutting ahead as far towards the food as the
+            # gap to the tail allows. Once tight, a shortcut could leave the
+            # cells it skips free inside the body until the board is nearly full,
+            # when growing into the last free cells ahead would run into the tail
+            room = self.ahead(head, tail) or len(self.cycle)
+            successor = self.cycle[(self.cycle_order[head] + 1) % len(self.cycle)]
+            if food not in self.cycle_order or self.tight():
+                return successor
+            holes = self.holes(head, tail)
+            shortcuts = [cell for cell in self.neighbours(head) if cell in self.cycle_order and
+                         1 < self.ahead(head, cell) and self.safe_cut(room, holes, self.ahead(head, cell), 1)]
+            if not shortcuts:
+                return successor
+            to_food = self.ahead(head, food)
+            return min(shortcuts + [successor], key=lambda cell: (to_food - self.ahead(head, cell)) % len(self.cycle))
+        return self.greedy_move(head, food, tail)
+
+    def greedy_move(self, head, food, tail):
+        # No cycle on this board and no safe path to the food: chase the tail
+        # the long way round (the safe cell furthest from the food), which
+        # moves the body out of the way until a safe path opens up
+        free = [cell for cell in self.neighbours(head) if not self.blocked(cell, tail)]
+        if not free:
+            return None
+        safe = [cell for cell in free if self.tail_reachable_after(head, [cell], cell == food)]
+        if not safe:
+            return min(free, key=lambda cell: abs(cell[0] - food[0]) + abs(cell[1] - food[1]))
+        return max(safe, key=lambda cell: abs(cell[0] - food[0]) + abs(cell[1] - food[1]))
+
+def lerp(start, end, alpha):
+    return (start[0] + (end[0] - start[0]) * alpha, start[1] + (end[1] - start[1]) * alpha)
+
+def draw_game(game, alpha=1.0):
+    # alpha is how far we are between the last tick and the next one; the head
+    # slides into its new cell and the tail slides out of the old one
+    screen.fill(black)
+    pygame.draw.rect(screen, green, [game.foodx, game.foody, snake_block, snake_block])
+    if game.previous_tail is not None and game.snake_List:
+        tail = lerp(game.previous_tail, game.snake_List[0], alpha)
+        pygame.draw.rect(screen, white, [tail[0], tail[1], snake_block, snake_block])
+    head = lerp(game.previous_head, (game.x1, game.y1), alpha)
+    draw_snake(snake_block, game.snake_List, head)
+    show_score(game.Length_of_snake - 1)
+    pygame.display.update()
+
+def draw_game_over(game):
+    screen.fill(white)
+    message("Game Over! Q-Quit, C-Play", red)
+    show_score(game.Length_of_snake - 1)
+    pygame.display.update()
+
+def gameLoop():
+    # One session: rounds restart in place instead of recursing. Logic ticks
+    # at snake_speed and is drawn at render_fps in between
+    init_display()
+    game = SnakeGame(screen_width, screen_height, snake_block)
+    loop = GameLoop(snake_speed, render_fps)
+    # A toggles the autopilot (it can only promise not to crash when it has
+    # steered since the start of the round); started with --autopilot it also
+    # restarts rounds by itself (attract mode)
+    attract_mode = "--autopilot" in sys.argv[1:]
+    autopilot = Autopilot(game) if attract_mode else None
+
+    def handle_event(event):
+        nonlocal autopilot
+        if game.game_close:
+            if event.type == pygame.NOEVENT:
+                game.reset()
+                loop.resume()
             if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_LEFT:
-                    x1_change = -snake_block
-                    y1_change = 0
-                elif event.key == pygame.K_RIGHT:
-                    x1_change = snake_block
-                    y1_change = 0
-                elif event.key == pygame.K_UP:
-                    y1_change = -snake_block
-                    x1_change = 0
-                elif event.key == pygame.K_DOWN:
-                    y1_change = snake_block
-                    x1_change = 0
-
-        if x1 >= screen_width or x1 < 0 or y1 >= screen_height or y1 < 0:
-            game_close = True
-        x1 += x1_change
-        y1 += y1_change
-        screen.fill(black)
-        pygame.draw.rect(screen, green, [foodx, foody, snake_block, snake_block])
-        snake_Head = []
-        snake_Head.append(x1)
-        snake_Head.append(y1)
-        snake_List.append(snake_Head)
-        if len(snake_List) > Length_of_snake:
-            del snake_List[0]
-
-        for x in snake_List[:-1]:
-            if x == snake_Head:
-                game_close = True
-
-        draw_snake(snake_block, snake_List)
-        show_score(Length_of_snake - 1)
-
-        pygame.display.update()
-
-        if x1 == foodx and y1 == foody:
-            foodx = round(random.randrange(0, screen_width - snake_block) / float(snake_block)) * float(snake_block)
-            foody = round(random.randrange(0, screen_height - snake_block) / float(snake_block)) * float(snake_block)
-            Length_of_snake += 1
-
-        clock.tick(snake_speed)
+                if event.key == pygame.K_q:
+                    loop.stop()
+                if event.key == pygame.K_c:
+                    game.reset()
+                    loop.resume()
+            return
+
+        if event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_LEFT:
+                game.turn(-snake_block, 0)
+            elif event.key == pygame.K_RIGHT:
+                game.turn(snake_block, 0)
+            elif event.key == pygame.K_UP:
+                game.turn(0, -snake_block)
+            elif event.key == pygame.K_DOWN:
+                game.turn(0, snake_block)
+            elif event.key == pygame.K_a:
+                autopilot = None if autopilot else Autopilot(game)
+
+    def update():
+        if autopilot:
+            move = autopilot.next_move()
+            if move:
+                game.turn(*move)
+        game.step()
+        if game.game_close:
+            # Draw the game over screen once, then sleep until a key is pressed
+            # (in attract mode the next round starts by itself after a while)
+            loop.wait(2000 if attract_mode else 0)
+
+    def render(alpha):
+        if game.game_close:
+            draw_game_over(game)
+        else:
+            draw_game(game, alpha)
 
+    loop.run(update, render, handle_event)
     pygame.quit()
     quit()
 
-gameLoop()
+if __name__ == "__main__":
+    gameLoop()
@@ -2,8 +2,7 @@
 import pygame
 import random
 
-# Initialize Pygame
-pygame.init()
+from runtime import GameLoop, open_window
 
 # Screen dimensions
 SCREEN_WIDTH = 300
@@ -17,6 +16,14 @@ BLACK = (0, 0, 0)
 WHITE = (255, 255, 255)
 GRAY = (128, 128, 128)
 
+# Game logic runs in fixed 60 Hz ticks; the piece falls a row every FALL_TICKS
+TICK_RATE = 60
+FALL_TICKS = 30 # 500 ms
+
+# Completed rows flash for this many ticks before they collapse (300 ms)
+LINE_CLEAR_FRAMES = 18
+LINE_CLEAR_FLASH_FRAMES = 3
+
 # Tetromino shapes and colors
 SHAPES = [
     [[1, 1, 1, 1]],  # I
@@ -39,6 +46,51 @@ for shape in SHAPES:
             rotations.append(current_shape)
     ROTATIONS.append(rotations)
 
+# Bitboard masks: one int per shape row with bit x set for a filled cell in
+# column x, so a piece at column px covers row bits (mask << px)
+ROTATION_MASKS = [
+    [[sum(1 << x for x, cell in enumerate(row) if cell) for row in rotation] for rotation in rotations]
+    for rotations in ROTATIONS
+]
+FULL_ROW = (1 << GRID_WIDTH) - 1
+
+# Highest and lowest filled row in each column of every rotation, for the
+# column height (skyline) index
+ROTATION_TOPS = [
+    [[min(y for y, row in enumerate(rotation) if row[x]) for x in range(len(rotation[0]))] for rotation in rotations]
+    for rotations in ROTATIONS
+]
+ROTATION_BOTTOMS = [
+    [[max(y for y, row in enumerate(rotation) if row[x]) for x in range(len(rotation[0]))] for rotation in rotations]
+    for rotations in ROTATIONS
+]
+
+
+def landing_row(heights, shape_index, rotation, x):
+    # Row where a piece dropped from above the stack at column x comes to rest
+    bottoms = ROTATION_BOTTOMS[shape_index][rotation]
+    return min(GRID_HEIGHT - heights[x + i] - 1 - bottom for i, bottom in enumerate(bottoms))
+
+
+def raise_heights(heights, shape_index, rotation, x, y):
+    # Update column heights in place for a piece locked at (x, y)
+    for i, top in enumerate(ROTATION_TOPS[shape_index][rotation]):
+        heights[x + i] = max(heights[x + i], GRID_HEIGHT - (y + top))
+
+
+def lower_heights(heights, rows, cleared_rows):
+    # Update column heights in place once cleared_rows have been collapsed out
+    # of rows. Full rows lie under every column's top, so each column simply
+    # drops by the number of cleared rows, unless its top cell was cleared too
+    # and the column has to be rescanned
+    cleared = len(cleared_rows)
+    for x in range(GRID_WIDTH):
+        if GRID_HEIGHT - heights[x] in cleared_rows:
+            bit = 1 << x
+            heights[x] = next((GRID_HEIGHT - y for y, row in enumerate(rows) if row & bit), 0)
+        else:
+            heights[x] -= cleared
+
 COLORS = [
     (0, 255, 255),  # Cyan
     (255, 0, 0),    # Red
@@ -57,6 +109,7 @@ class Tetromino:
         self.rotations = ROTATIONS[shape_index]
         self.rotation = 0
         self.shape = self.rotations[self.rotation]
+        self.masks = ROTATION_MASKS[shape_index][self.rotation]
         self.color = COLORS[shape_index]
 
     def rotate(self, clockwise=True):
@@ -65,78 +118,206 @@ class Tetromino:
         else:
             self.rotation = (self.rotation - 1 + len(self.rotations)) % len(self.rotations)
         self.shape = self.rotations[self.rotation]
+        self.masks = ROTATION_MASKS[self.shape_index][self.rotation]
 
 class Tetris:
-    def __init__(self):
-        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-        pygame.display.set_caption("Tetris")
-        self.clock = pygame.time.Clock()
+    def __init__(self, headless=False, seed=None):
+        # Headless games (AI search, self-play) have no window and clear lines
+        # without the animation
+        self.headless = headless
+        self.random = random.Random(seed)
+        # The board is a bitboard of row masks for the game logic plus a color
+        # plane (shape index + 1 per cell, 0 for empty) for rendering
+        self.rows = [0] * GRID_HEIGHT
         self.grid = [[0 for _ in range(GRID_WIDTH)] for _ in range(GRID_HEIGHT)]
+        # Column height index (0 for an empty column) and number of filled
+        # cells, kept up to date by lock_piece and collapse_lines
+        self.heights = [0] * GRID_WIDTH
+        self.filled_cells = 0
+        self.next_shape = self.random.randint(0, len(SHAPES) - 1)
         self.current_piece = self.new_piece()
         self.game_over = False
         self.score = 0
+        self.lines = 0
+        self.clearing_rows = []  # Completed rows being animated before they collapse
+        self.clear_timer = 0
+        self.fall_ticks = 0
+        self.line_clear_frames = 0 if headless else LINE_CLEAR_FRAMES
+        if headless:
+            return
+
+        self.screen = open_window((SCREEN_WIDTH, SCREEN_HEIGHT), "Tetris")
         self.font = pygame.font.Font(None, 36)
 
+        # Cached board layers: locked cells (redrawn only when the board changes)
+        # and the gridlines on top of them (drawn once)
+        self.cells_surface = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT)).convert()
+        self.cells_surface.fill(BLACK)
+        self.gridlines_surface = self.render_gridlines()
+
     def new_piece(self):
-        shape_index = random.randint(0, len(SHAPES) - 1)
+        # The next shape is drawn one piece ahead so it can be looked ahead at
+        shape_index = self.next_shape
+        self.next_shape = self.random.randint(0, len(SHAPES) - 1)
         return Tetromino(GRID_WIDTH // 2 - 1, 0, shape_index)
 
     def check_collision(self, piece):
-        for y, row in enumerate(piece.shape):
-            for x, cell in enumerate(row):
-                if cell:
-                    if (
-                        piece.x + x < 0
-                        or piece.x + x >= GRID_WIDTH
-                        or piece.y + y >= GRID_HEIGHT
-                        or self.grid[piece.y + y][piece.x + x]
-                    ):
-                        return True
+        # Shapes fill their bounding box edge to edge, so the walls and floor
+        # only need a bounds check
+        if (
+            piece.x < 0
+            or piece.x + len(piece.shape[0]) > GRID_WIDTH
+            or piece.y + len(piece.shape) > GRID_HEIGHT
+        ):
+            return True
+        for y, mask in enumerate(piece.masks):
+            if self.rows[piece.y + y] & (mask << piece.x):
+                return True
         return False
 
     def lock_piece(self, piece):
+        for y, mask in enumerate(piece.masks):
+            self.rows[piece.y + y] |= mask << piece.x
+            self.filled_cells += mask.bit_count()
+        raise_heights(self.heights, piece.shape_index, piece.rotation, piece.x, piece.y)
         for y, row in enumerate(piece.shape):
             for x, cell in enumerate(row):
                 if cell:
                     self.grid[piece.y + y][piece.x + x] = piece.shape_index + 1
+                    if not self.headless:
+                        self.draw_cell(piece.x + x, piece.y + y)
         self.clear_lines()
+        if self.clearing_rows:
+            # The next piece spawns once the cleared rows have collapsed
+            self.current_piece = None
+        else:
+            self.spawn_piece()
+
+    def drop_row(self, piece):
+        # Row the piece would land on if dropped straight down, read off the
+        # column height index
+        y = landing_row(self.heights, piece.shape_index, piece.rotation, piece.x)
+        if y >= piece.y:
+            return y
+        # The piece has been slid under an overhang, so step down from it
+        y = piece.y
+        piece_y = piece.y
+        while True:
+            piece.y = y + 1
+            if self.check_collision(piece):
+                break
+            y += 1
+        piece.y = piece_y
+        return y
+
+    def hard_drop(self):
+        self.current_piece.y = self.drop_row(self.current_piece)
+        self.lock_piece(self.current_piece)
+
+    def spawn_piece(self):
         self.current_piece = self.new_piece()
         if self.check_collision(self.current_piece):
             self.game_over = True
 
     def clear_lines(self):
-        lines_to_clear = []
-        for y, row in enumerate(self.grid):
-            if all(row):
-                lines_to_clear.append(y)
+        lines_to_clear = [y for y, row in enumerate(self.rows) if row == FULL_ROW]
 
         if lines_to_clear:
-            pygame.time.wait(300)  # Pause to show the completed line
-            for y in lines_to_clear:
-                del self.grid[y]
-                self.grid.insert(0, [0 for _ in range(GRID_WIDTH)])
-            self.score += len(lines_to_clear) * 100
+            # Mark the rows; update_line_clear animates them and then collapses them
+            self.clearing_rows = lines_to_clear
+            self.clear_timer = self.line_clear_frames
+            if self.line_clear_frames == 0:
+                self.collapse_lines()
+
+    def update_line_clear(self):
+        # Advance the line clear animation by one frame
+        if not self.clearing_rows:
+            return
+        self.clear_timer -= 1
+        if self.clear_timer <= 0:
+            self.collapse_lines()
+            self.spawn_piece()
+
+    def collapse_lines(self):
+        # Drop the cleared rows and shift everything above them down
+        cleared = len(self.clearing_rows)
+        kept = [y for y in range(GRID_HEIGHT) if y not in self.clearing_rows]
+        self.rows = [0] * cleared + [self.rows[y] for y in kept]
+        self.grid = [[0 for _ in range(GRID_WIDTH)] for _ in range(cleared)] + [self.grid[y] for y in kept]
+        lower_heights(self.heights, self.rows, self.clearing_rows)
+        self.filled_cells -= cleared * GRID_WIDTH
+        self.score += cleared * 100
+        self.lines += cleared
+        self.clearing_rows = []
+        if not self.headless:
+            self.redraw_cells()
 
     def draw_score(self):
         score_text = self.font.render(f"Score: {self.score}", True, WHITE)
         self.screen.blit(score_text, (10, 10))
 
 
-    def draw_grid(self):
+    def render_gridlines(self):
+        surface = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT)).convert()
+        surface.fill(BLACK)
+        surface.set_colorkey(BLACK)
         for y in range(GRID_HEIGHT):
             for x in range(GRID_WIDTH):
-                if self.grid[y][x]:
-                    pygame.draw.rect(
-                        self.screen,
-                        COLORS[self.grid[y][x] - 1],
-                        (x * GRID_SIZE, y * GRID_SIZE, GRID_SIZE, GRID_SIZE),
-                    )
                 pygame.draw.rect(
-                    self.screen,
+                    surface,
                     GRAY,
                     (x * GRID_SIZE, y * GRID_SIZE, GRID_SIZE, GRID_SIZE),
                     1,
                 )
+        return surface
+
+    def draw_cell(self, x, y):
+        pygame.draw.rect(
+            self.cells_surface,
+            COLORS[self.grid[y][x] - 1] if self.grid[y][x] else BLACK,
+            (x * GRID_SIZE, y * GRID_SIZE, GRID_SIZE, GRID_SIZE),
+        )
+
+    def redraw_cells(self):
+        self.cells_surface.fill(BLACK)
+        for y in range(GRID_HEIGHT):
+            if self.rows[y]:
+                for x in range(GRID_WIDTH):
+                    if self.grid[y][x]:
+                        self.draw_cell(x, y)
+
+    def draw_grid(self):
+        # Two blits, however full the board is
+        self.screen.blit(self.cells_surface, (0, 0))
+        self.screen.blit(self.gridlines_surface, (0, 0))
+
+    def draw_clearing_rows(self):
+        # Flash the completed rows white while they are being cleared
+        if (self.clear_timer // LINE_CLEAR_FLASH_FRAMES) % 2 == 0:
+            for y in self.clearing_rows:
+                pygame.draw.rect(
+                    self.screen,
+                    WHITE,
+                    (0, y * GRID_SIZE, SCREEN_WIDTH, GRID_SIZE),
+                )
+
+    def draw_ghost_piece(self, piece):
+        # Outline of where the piece will land
+        ghost_y = self.drop_row(piece)
+        for y, row in enumerate(piece.shape):
+            for x, cell in enumerate(row):
+                if cell:
+                    pygame.draw.rect(
+                        self.screen,
+                        piece.color,
+                        (
+                            (piece.x + x) * GRID_SIZE,
+                            (ghost_y + y) * GRID_SIZE,
+                            GRID_SIZE,
+                            GRID_SIZE,
+                        ),
+                        2,
+                    )
 
     def draw_piece(self, piece):
         for y, row in enumerate(piece.shape):
@@ -153,48 +334,74 @@ class Tetris:
                         ),
                     )
 
-    def run(self):
-        fall_time = 0
-        fall_speed = 500  # milliseconds
-
-        while not self.game_over:
-            self.screen.fill(BLACK)
-            fall_time += self.clock.tick(60)
-
-            if fall_time > fall_speed:
-                fall_time = 0
-                self.current_piece.y += 1
-                if self.check_collision(self.current_piece):
-                    self.current_piece.y -= 1
-                    self.lock_piece(self.current_piece)
-
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    self.game_over = True
-                if event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_LEFT:
-                        self.current_piece.x -= 1
-                        if self.check_collision(self.current_piece):
-                            self.current_piece.x += 1
-                    if event.key == pygame.K_RIGHT:
-                        self.current_piece.x += 1
-                        if self.check_collision(self.current_piece):
-                            self.current_piece.x -= 1
-                    if event.key == pygame.K_DOWN:
-                        self.current_piece.y += 1
-                        if self.check_collision(self.current_piece):
-                            self.current_piece.y -= 1
-                    if event.key == pygame.K_UP:
-                        self.current_piece.rotate()
-                        if self.check_collision(self.current_piece):
-                            self.current_piece.rotate(clockwise=False)
-
-
-            self.draw_grid()
+    def update(self):
+        # One tick: the line clear animation, then gravity
+        self.update_line_clear()
+
+        if self.current_piece is None:
+            # Nothing falls while completed rows are being cleared
+            self.fall_ticks = 0
+            return
+        self.fall_ticks += 1
+        if self.fall_ticks >= FALL_TICKS:
+            self.fall_ticks = 0
+            self.current_piece.y += 1
+            if self.check_collision(self.current_piece):
+                self.current_piece.y -= 1
+                self.lock_piece(self.current_piece)
+
+    def move_piece(self, dx, dy):
+        # Shift the falling piece unless something is in the way; True if it moved
+        piece = self.current_piece
+        piece.x += dx
+        piece.y += dy
+        if self.check_collision(piece):
+            piece.x -= dx
+            piece.y -= dy
+            return False
+        return True
+
+    def rotate_piece(self):
+        self.current_piece.rotate()
+        if self.check_collision(self.current_piece):
+            self.current_piece.rotate(clockwise=False)
+            return False
+        return True
+
+    def handle_event(self, event):
+        if event.type == pygame.QUIT:
+            self.game_over = True
+        if event.type == pygame.KEYDOWN and self.current_piece is not None:
+            if event.key == pygame.K_LEFT:
+                self.move_piece(-1, 0)
+            if event.key == pygame.K_RIGHT:
+                self.move_piece(1, 0)
+            if event.key == pygame.K_DOWN:
+                self.move_piece(0, 1)
+            if event.key == pygame.K_UP:
+                self.rotate_piece()
+            if event.key == pygame.K_SPACE:
+                self.hard_drop()
+
+    def render(self, alpha=1.0):
+        self.draw_grid()
+        if self.clearing_rows:
+            self.draw_clearing_rows()
+        if self.current_piece is not None:
+            self.draw_ghost_piece(self.current_piece)
             self.draw_piece(self.current_piece)
-            self.draw_score()
-            pygame.display.update()
+        self.draw_score()
+        pygame.display.update()
+
+    def run(self):
+        loop = GameLoop(TICK_RATE)
+
+        def update():
+            self.update()
+            if self.game_over:
+                loop.stop()
 
+        loop.run(update, self.render, self.handle_event)
         pygame.quit()
 
 if __name__ == "__main__":
@@ -0,0 +1,260 @@
+
+import argparse
+import os
+import statistics
+from concurrent.futures import ProcessPoolExecutor
+
+import pygame
+
+from runtime import GameLoop
+from tetris import (
+    FULL_ROW,
+    GRID_HEIGHT,
+    GRID_WIDTH,
+    ROTATION_MASKS,
+    ROTATIONS,
+    TICK_RATE,
+    Tetris,
+    landing_row,
+    lower_heights,
+    raise_heights,
+)
+
+# Heuristic weights for scoring the board left by a placement
+DEFAULT_WEIGHTS = {
+    "holes": -0.36,
+    "aggregate_height": -0.51,
+    "bumpiness": -0.18,
+    "lines": 0.76,
+}
+
+SPAWN_X = GRID_WIDTH // 2 - 1
+
+
+def collides(rows, masks, x, y):
+    # Same test as Tetris.check_collision, on a bare bitboard; a row mask
+    # shifted past FULL_ROW pokes out of the right wall
+    if x < 0 or y + len(masks) > GRID_HEIGHT:
+        return True
+    for i, mask in enumerate(masks):
+        shifted = mask << x
+        if shifted > FULL_ROW or rows[y + i] & shifted:
+            return True
+    return False
+
+
+def drop_row(rows, heights, shape_index, rotation, x, y):
+    # Landing row from the column height index; only a piece that has slid
+    # under an overhang needs stepping down
+    landing = landing_row(heights, shape_index, rotation, x)
+    if landing >= y:
+        return landing
+    masks = ROTATION_MASKS[shape_index][rotation]
+    while not collides(rows, masks, x, y + 1):
+        y += 1
+    return y
+
+
+def placements(rows, heights, shape_index, rotation=0, x=SPAWN_X, y=0):
+    # Every (rotation, column, landing row) the piece can reach from where it is
+    # with the game's controls: rotate in place, slide sideways, then drop
+    rotation_count = len(ROTATIONS[shape_index])
+    for turns in range(rotation_count):
+        turned = (rotation + turns) % rotation_count
+        masks = ROTATION_MASKS[shape_index][turned]
+        if collides(rows, masks, x, y):
+            break # Blocked rotations also block every rotation after them
+
+        columns = [x]
+        for step in (-1, 1):
+            column = x + step
+            while not collides(rows, masks, column, y):
+                columns.append(column)
+                column += step
+
+        for column in columns:
+            yield turned, column, drop_row(rows, heights, shape_index, turned, column, y)
+
+
+def place(rows, heights, filled_cells, shape_index, rotation, x, y):
+    # The board after locking the piece and collapsing full rows, as (rows,
+    # heights, filled cells, rows cleared); the inputs are left untouched
+    masks = ROTATION_MASKS[shape_index][rotation]
+    rows = rows[:]
+    for i, mask in enumerate(masks):
+        rows[y + i] |= mask << x
+    heights = heights[:]
+    raise_heights(heights, shape_index, rotation, x, y)
+    filled_cells += sum(mask.bit_count() for mask in masks)
+
+    # Only rows the piece touched can have been completed
+    cleared_rows = [y + i for i in range(len(masks)) if rows[y + i] == FULL_ROW]
+    if cleared_rows:
+        rows = [0] * len(cleared_rows) + [row for row in rows if row != FULL_ROW]
+        lower_heights(heights, rows, cleared_rows)
+        filled_cells -= len(cleared_rows) * GRID_WIDTH
+    return rows, heights, filled_cells, len(cleared_rows)
+
+
+def board_features(heights, filled_cells):
+    # Holes (empty cells under a column's top), aggregate height and bumpiness,
+    # straight from the column height index: every filled cell sits under its
+    # column's top, so the holes are whatever the heights don't account for
+    aggregate_height = sum(heights)
+    holes = aggregate_height - filled_cells
+    bumpiness = sum(abs(a - b) for a, b in zip(heights, heights[1:]))
+    return holes, aggregate_height, bumpiness
+
+
+class TetrisAI:
+    def __init__(self, weights=None, lookahead=True):
+        self.weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+        self.lookahead = lookahead
+
+    def evaluate(self, heights, filled_cells, lines):
+        holes, aggregate_height, bumpiness = board_features(heights, filled_cells)
+        return (
+            self.weights["holes"] * holes
+            + self.weights["aggregate_height"] * aggregate_height
+            + self.weights["bumpiness"] * bumpiness
+            + self.weights["lines"] * lines
+        )
+
+    def choose(self, game):
+        # Best (rotation, x, y) for the current piece, or None if it can't move
+        piece = game.current_piece
+        best_value = None
+        best_move = None
+        for rotation, x, y in placements(game.rows, game.heights, piece.shape_index, piece.rotation, piece.x, piece.y):
+            rows, heights, filled_cells, lines = place(
+                game.rows, game.heights, game.filled_cells, piece.shape_index, rotation, x, y
+            )
+            if self.lookahead:
+                value = self.best_follow_up(rows, heights, filled_cells, lines, game.next_shape)
+            else:
+                value = self.evaluate(heights, filled_cells, lines)
+            if value is not None and (best_value is None or value > best_value):
+                best_value = value
+                best_move = (rotation, x, y)
+        if best_move is None:
+            # Every placement tops out; take any legal one
+            best_move = next(
+                placements(game.rows, game.heights, piece.shape_index, piece.rotation, piece.x, piece.y), None
+            )
+        return best_move
+
+    def best_follow_up(self, rows, heights, filled_cells, lines, shape_index):
+        # Value of the best placement of the next piece, or None if it can't spawn
+        best = None
+        for rotation, x, y in placements(rows, heights, shape_index):
+            _, after, after_filled, more_lines = place(rows, heights, filled_cells, shape_index, rotation, x, y)
+            value = self.evaluate(after, after_filled, lines + more_lines)
+            if best is None or value > best:
+                best = value
+        return best
+
+    def play_piece(self, game):
+        move = self.choose(game)
+        if move is None:
+            game.game_over = True
+            return
+        rotation, x, y = move
+        piece = game.current_piece
+        while piece.rotation != rotation:
+            piece.rotate()
+        piece.x = x
+        piece.y = y
+        game.lock_piece(piece)
+
+
+def play_game(seed, weights=None, lookahead=True, max_pieces=500):
+    # One headless game; module level so worker processes can run it
+    game = Tetris(headless=True, seed=seed)
+    ai = TetrisAI(weights, lookahead)
+    pieces = 0
+    while not game.game_over and pieces < max_pieces:
+        ai.play_piece(game)
+        pieces += 1
+    return {"seed": seed, "score": game.score, "lines": game.lines, "pieces": pieces}
+
+
+def self_play(games, weights=None, lookahead=True, max_pieces=500, workers=None, first_seed=0):
+    # Play many headless games across a process pool and aggregate the results
+    seeds = range(first_seed, first_seed + games)
+    workers = workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(
+            play_game,
+            seeds,
+            [weights] * games,
+            [lookahead] * games,
+            [max_pieces] * games,
+            chunksize=max(1, games // (workers * 4)),
+        ))
+    return summarize(results)
+
+
+def summarize(results):
+    summary = {"games": len(results)}
+    for key in ("score", "lines", "pieces"):
+        values = [result[key] for result in results]
+        summary[key] = {
+            "mean": statistics.mean(values),
+            "median": statistics.median(values),
+            "min": min(values),
+            "max": max(values),
+            "stdev": statistics.stdev(values) if len(values) > 1 else 0.0,
+        }
+    return summary
+
+
+def watch(ai, move_delay=150):
+    # Let the AI play in a window, placing one piece every move_delay ms
+    game = Tetris()
+    loop = GameLoop(TICK_RATE)
+    move_ticks = move_delay * TICK_RATE // 1000
+    ticks_since_move = 0
+
+    def update():
+        nonlocal ticks_since_move
+        ticks_since_move += 1
+        game.update_line_clear()
+        if game.current_piece is not None and ticks_since_move > move_ticks:
+            ticks_since_move = 0
+            ai.play_piece(game)
+        if game.game_over:
+            loop.stop()
+
+    def render(alpha):
+        game.draw_grid()
+        if game.clearing_rows:
+            game.draw_clearing_rows()
+        if game.current_piece is not None:
+            game.draw_piece(game.current_piece)
+        game.draw_score()
+        pygame.display.update()
+
+    loop.run(update, render)
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tetris placement-search AI")
+    parser.add_argument("--self-play", type=int, metavar="GAMES", help="play GAMES headless games and print statistics")
+    parser.add_argument("--workers", type=int, help="worker processes for self-play (default: all cores)")
+    parser.add_argument("--max-pieces", type=int, default=500, help="stop each self-play game after this many pieces")
+    parser.add_argument("--no-lookahead", action="store_true", help="only score the current piece")
+    for name, value in DEFAULT_WEIGHTS.items():
+        parser.add_argument("--" + name.replace("_", "-"), type=float, default=value, help=f"heuristic weight (default {value})")
+    args = parser.parse_args()
+
+    weights = {name: getattr(args, name) for name in DEFAULT_WEIGHTS}
+    if args.self_play:
+        summary = self_play(args.self_play, weights, not args.no_lookahead, args.max_pieces, args.workers)
+        print(f"Games: {summary['games']}")
+        for key in ("score", "lines", "pieces"):
+            stats = summary[key]
+            print(f"{key.capitalize()}: mean {stats['mean']:.1f}, median {stats['median']}, "
+                  f"min {stats['min']}, max {stats['max']}, stdev {stats['stdev']:.1f}")
+    else:
+        watch(TetrisAI(weights, not args.no_lookahead))